@@ -17,7 +17,7 @@ from .models.AppListElement import InstalledStatus
 from .providers.AppImageProvider import AppImageListElement, AppImageUpdateLogic
 from .providers.providers_list import appimage_provider
 from .lib.async_utils import _async, idle, debounce
-from .lib.utils import url_is_valid, get_file_hash, get_application_window, show_message_dialog, gnu_naturalsize, check_internet
+from .lib.utils import url_is_valid, get_file_digests, get_application_window, show_message_dialog, gnu_naturalsize, check_internet
 from .components.CustomComponents import CenteringBox, LabelStart
 from .components.AppDetailsConflictModal import AppDetailsConflictModal
 from .components.AdwEntryRowDefault import AdwEntryRowDefault
@@ -1041,12 +1041,10 @@ class AppDetails(Gtk.ScrolledWindow):
         return row
 
     def create_app_hash_row(self) -> Adw.ActionRow:
-        md5_hash = get_file_hash(Gio.File.new_for_path(self.app_list_element.file_path))
-        sha1_hash = get_file_hash(Gio.File.new_for_path(self.app_list_element.file_path), 'sha1')
-        sha256_hash = get_file_hash(Gio.File.new_for_path(self.app_list_element.file_path), 'sha256')
+        digests = get_file_digests(self.app_list_element.file_path)
 
         row = Adw.ActionRow(
-            subtitle=f'md5: {md5_hash}\nsha1: {sha1_hash}\nsha256: {sha256_hash}', 
+            subtitle=f'md5: {digests["md5"]}\nsha1: {digests["sha1"]}\nsha256: {digests["sha256"]}', 
             title=_('Hash'),
             selectable=True
         )
@@ -4,7 +4,7 @@ from .lib.terminal import sandbox_sh
 from .lib.utils import check_internet
 from .lib.constants import UPDATES_AVAILABLE_LABEL, ONE_UPDATE_AVAILABLE_LABEL, APP_ID
 from .providers.AppImageProvider import AppImageProvider
-from .models.UpdateManagerChecker import UpdateManagerChecker
+from .models.UpdatesChecker import UpdatesChecker
 
 class BackgroudUpdatesFetcher():
     @staticmethod
@@ -18,21 +18,16 @@ class BackgroudUpdatesFetcher():
         installed = provider.list_installed()
         updates_available = 0
 
-        for el in installed:
-            manager = UpdateManagerChecker.check_url_for_app(el)
+        deferred = 0
 
-            if not manager:
-                continue
+        for result in UpdatesChecker().iter_results(installed):
+            if result.available:
+                updates_available += 1
+            elif result.deferred:
+                deferred += 1
 
-            logging.debug(f'Checking app with: {manager.name}')
-
-            try:
-                status = manager.is_update_available()
-
-                if status:
-                    updates_available += 1
-            except Exception as e:
-                logging.error(e)
+        if deferred:
+            logging.warning(f'{deferred} update checks were deferred because of rate limits')
 
         if updates_available:
             content = ''
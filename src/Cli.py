@@ -2,22 +2,27 @@ import sys
 import os
 import logging
 import json
+import time
 import traceback
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import redirect_stdout
 from .lib.constants import APP_ID
 from gi.repository import Gio # noqa
 from .BackgroudUpdatesFetcher import BackgroudUpdatesFetcher
 from .lib.constants import FETCH_UPDATES_ARG
 from .lib.utils import make_option, check_internet
+from .lib import terminal
 from .providers.providers_list import appimage_provider
-from .providers.AppImageProvider import AppImageUpdateLogic, AppImageListElement
+from .providers.AppImageProvider import AppImageUpdateLogic, AppImageListElement, INSTALL_JOBS
 from .lib.ini_config import Config
 from .models.UpdateManagerChecker import UpdateManagerChecker
+from .models.UpdatesChecker import UpdatesChecker
 from .models.UpdateManager import UpdateManager
 
 class Cli():
     options = [
-        make_option('integrate', description='Integrate an AppImage file'),
+        make_option('integrate', description='Integrate one or more AppImage files'),
         make_option('update', description='Update an AppImage file'),
         make_option('remove', description='Trashes an AppImage, its .desktop file and icons'),
         make_option('remove-all', description='Removes all AppImages'),
@@ -83,8 +88,10 @@ class Cli():
             print('Internet connection not available')
             sys.exit(1)
 
+        managers: dict[str, UpdateManager] = {}
+
         if update_all:
-            Cli.list_updates([])
+            results = Cli.list_updates([])
             
             if not assume_yes:
                 ans = Cli.ask('\nDo you really want to update all AppImages? (y/N)', ['y', 'Y', 'n', 'N'])
@@ -92,13 +99,10 @@ class Cli():
                     sys.exit(0)
 
             assume_yes = True
+            # the managers of the check already know which file to download
+            managers = {r.el.file_path: r.manager for r in results if r.available}
             installed = appimage_provider.list_installed()
-            
-            for el in installed:
-                manager = UpdateManagerChecker.check_url_for_app(el)
-
-                if manager and manager.is_update_available():
-                    updates.append(el)
+            updates = [el for el in installed if el.file_path in managers]
         else:
             g_file = Cli._get_file_from_args(argv)
             el = Cli._get_list_element_from_gfile(g_file)
@@ -112,7 +116,7 @@ class Cli():
                 print(f'{el.file_path} was skipped because the application is running; use --force to skip this check.')
                 continue
 
-            manager = UpdateManagerChecker.check_url_for_app(el)
+            manager = managers.get(el.file_path) or UpdateManagerChecker.check_url_for_app(el)
 
             if not manager:
                 print('No update method was found for this AppImage')
@@ -175,10 +179,11 @@ class Cli():
             ans = Cli.ask(f'{q} (y/N)', ['y', 'Y', 'n', 'N'])
 
         if ans.lower() == 'y' or assume_yes:
-            for el in apps:
-                if appimage_provider.is_installed(el):
-                    print(f'Removing {el.file_path}')
-                    appimage_provider.uninstall(el, force_delete=True)
+            with Config.transaction():
+                for el in apps:
+                    if appimage_provider.is_installed(el):
+                        print(f'Removing {el.file_path}')
+                        appimage_provider.uninstall(el, force_delete=True)
 
     @staticmethod
     def set_update_source(argv):
@@ -243,9 +248,22 @@ class Cli():
             ['--replace', 'If a name conflict occurs, replaces the old file with the one that you are currently integrating'],
             ['--yes | -y', 'Skips any interactive question and integrates the file'],
             ['--update-url <url>', 'Set a custom URL for updates'],
-        ], text='Usage: --integrate <file_path>')
+            ['--jobs N', f'Number of AppImages processed at the same time, when integrating many files (default: {INSTALL_JOBS})'],
+        ], text='Usage: --integrate <file_path | folder>...')
 
-        g_file = Cli._get_file_from_args(argv)
+        jobs = Cli._get_arg_value(argv, '--jobs') or str(INSTALL_JOBS)
+
+        if (not jobs.isdigit()) or int(jobs) < 1:
+            print('Error: --jobs requires a positive number')
+            sys.exit(1)
+
+        g_files = Cli._get_files_from_args(argv)
+
+        if len(g_files) > 1:
+            Cli._integrate_many(argv, g_files, int(jobs))
+            return
+
+        g_file = g_files[0]
 
         list_element = appimage_provider.create_list_element_from_file(g_file)
         if appimage_provider.is_installed(list_element):
@@ -295,6 +313,60 @@ class Cli():
         appimage_provider.install_file(list_element)
         print(f'{list_element.file_path} was integrated successfully')
 
+    @staticmethod
+    def _integrate_many(argv, g_files: list[Gio.File], jobs: int):
+        els: list[AppImageListElement] = []
+
+        for g_file in g_files:
+            el = appimage_provider.create_list_element_from_file(g_file)
+
+            if appimage_provider.is_installed(el):
+                print(f'{el.file_path} is already integrated, skipping')
+                continue
+
+            el.update_logic = AppImageUpdateLogic.KEEP
+            els.append(el)
+
+        if not els:
+            sys.exit(0)
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(appimage_provider.refresh_data, els))
+
+        if '--replace' in argv:
+            installed = {a.name: a for a in appimage_provider.list_installed()}
+
+            for el in els:
+                # only one file of the batch can replace each app
+                if el.name in installed:
+                    el.update_logic = AppImageUpdateLogic.REPLACE
+                    el.updating_from = installed.pop(el.name)
+
+        if '--yes' not in argv \
+            and '-y' not in argv:
+
+            Cli._print_table([[el.name, el.version or '', el.file_path] for el in els])
+            ans = Cli.ask(f'\nDo you really want to integrate these {len(els)} AppImages? (y/N) ', ['y', 'Y', 'n', 'N'])
+
+            if ans.lower() != 'y':
+                sys.exit(0)
+
+        done = 0
+
+        def on_installed(el: AppImageListElement, error: Optional[Exception]):
+            nonlocal done
+            done += 1
+
+            if error:
+                print(f'[{done}/{len(els)}] Error: {el.file_path} could not be integrated: {error}')
+            else:
+                print(f'[{done}/{len(els)}] {el.file_path} was integrated successfully')
+
+        results = appimage_provider.install_files(els, jobs=jobs, callback=on_installed)
+
+        if any(error for el, error in results):
+            sys.exit(1)
+
     @staticmethod
     def list_installed(argv):
         Cli._print_help_if_requested(argv, [
@@ -305,26 +377,27 @@ class Cli():
         json_output = '--json' in argv
 
         table = []
-        for a in apps:
-            if json_output:
-                with redirect_stdout(sys.stderr):
-                    manager = UpdateManagerChecker.check_url_for_app(a)
+        with terminal.running_executables_snapshot():
+            for a in apps:
+                if json_output:
+                    with redirect_stdout(sys.stderr):
+                        manager = UpdateManagerChecker.check_url_for_app(a)
 
-                table.append(Cli._make_app_json(a, manager))
-                continue
+                    table.append(Cli._make_app_json(a, manager))
+                    continue
 
-            manager: UpdateManager | None = UpdateManagerChecker.check_url_for_app(a)
-            update_mng = 'UpdatesNotAvailable'
-            if manager:
-                update_mng = manager.name
+                manager: UpdateManager | None = UpdateManagerChecker.check_url_for_app(a)
+                update_mng = 'UpdatesNotAvailable'
+                if manager:
+                    update_mng = manager.name
 
-                if manager.embedded:
-                    update_mng += '|embedded'
+                    if manager.embedded:
+                        update_mng += '|embedded'
 
-            update_mng = f'[{update_mng}]'
+                update_mng = f'[{update_mng}]'
 
-            v = a.version or 'Not specified'
-            table.append([a.name, f'[{v}]', update_mng, a.file_path])
+                v = a.version or 'Not specified'
+                table.append([a.name, f'[{v}]', update_mng, a.file_path])
 
         if json_output:
             print(json.dumps({
@@ -344,6 +417,7 @@ class Cli():
         installed = appimage_provider.list_installed()
         table = []
         updates = []
+        deferred = []
         json_output = '--json' in argv
 
         if not check_internet():
@@ -351,19 +425,36 @@ class Cli():
                   file=sys.stderr if json_output else sys.stdout)
             sys.exit(1)
 
-        for el in installed:
-            manager = UpdateManagerChecker.check_url_for_app(el)
-            if not manager:
-                continue
+        if json_output:
+            with redirect_stdout(sys.stderr):
+                results = UpdatesChecker().check(installed)
+        else:
+            results = UpdatesChecker().check(installed)
 
-            try:
-                if json_output:
-                    with redirect_stdout(sys.stderr):
-                        update_available = manager.is_update_available()
-                else:
-                    update_available = manager.is_update_available()
+        # checks complete in any order, print them in the order of the installed apps
+        results_by_path = {r.el.file_path: r for r in results}
+
+        with terminal.running_executables_snapshot():
+            for el in installed:
+                result = results_by_path.get(el.file_path)
+                if not result or not (result.available or result.deferred):
+                    continue
+
+                manager = result.manager
+
+                try:
+                    if result.deferred:
+                        if json_output:
+                            deferred.append({
+                                **Cli._make_app_json(el, manager),
+                                'deferred_until': int(result.deferred_until),
+                            })
+                            continue
+
+                        until = time.strftime('%H:%M', time.localtime(result.deferred_until))
+                        table.append([el.name, f'[Check deferred until {until}, {manager.name}]', el.file_path])
+                        continue
 
-                if update_available:
                     if json_output:
                         updates.append(Cli._make_app_json(el, manager))
                         continue
@@ -376,21 +467,23 @@ class Cli():
                     #     row.append(json.dumps(dict(manager.get_config())))
 
                     table.append(row)
-            except Exception as e:
-                logging.error(traceback.format_exc())
+                except Exception as e:
+                    logging.error(traceback.format_exc())
 
         if json_output:
             print(json.dumps({
                 'schema_version': 1,
                 'updates': updates,
+                'deferred': deferred,
             }, ensure_ascii=False))
-            return
+            return results
 
         if not table:
             print('No updates available')
-            return
+            return results
 
         Cli._print_table(table)
+        return results
 
     @staticmethod
     def _make_app_json(el, manager):
@@ -511,6 +604,37 @@ class Cli():
         print('Error: please specify a valid AppImage file')
         sys.exit(1)
 
+    @staticmethod
+    def _get_files_from_args(args) -> list[Gio.File]:
+        """
+            Returns all the AppImages passed as arguments;
+            folders are replaced by the AppImages they contain
+        """
+        g_files = []
+
+        for i, a in enumerate(args[2:], start=2):
+            if a.startswith('-') or args[i - 1] in ['--jobs', '--update-url']:
+                continue
+
+            if os.path.isdir(a):
+                paths = [os.path.join(a, f) for f in sorted(os.listdir(a))]
+            elif os.path.isfile(a):
+                paths = [a]
+            else:
+                continue
+
+            for path in paths:
+                g_file = Gio.File.new_for_path(path)
+
+                if os.path.isfile(path) and appimage_provider.can_install_file(g_file):
+                    g_files.append(g_file)
+
+        if not g_files:
+            print('Error: please specify a valid AppImage file')
+            sys.exit(1)
+
+        return g_files
+
     @staticmethod
     def _get_list_element_from_gfile(g_file: Gio.File):
         el = None
@@ -241,7 +241,7 @@ class GearleverWindow(Adw.Window):
             self.left_button.set_child(self.open_appimage_button_child)
 
         if in_apps_list:
-            self.installed_apps_list.refresh_list()
+            self.installed_apps_list.sync_list()
 
         self.view_title_widget.set_visible(not in_app_details)
 
@@ -2,6 +2,7 @@ from gi.repository import Gtk, Adw, GObject, Gio, GLib
 from typing import Dict, List, Optional
 
 import logging
+import os
 
 from time import sleep
 from .providers.providers_list import appimage_provider
@@ -9,17 +10,18 @@ from .providers.AppImageProvider import AppImageListElement
 from .models.AppListElement import InstalledStatus
 from .components.FilterEntry import FilterEntry
 from .components.CustomComponents import NoAppsFoundRow
-from .components.AppListBoxItem import AppListBoxItem
+from .components.AppListBoxItem import AppListItemContent
 from .preferences import Preferences
 from .WelcomeScreen import WelcomeScreen
 from .lib.utils import get_application_window, check_internet
 from .lib.async_utils import _async, idle
-from .models.UpdateManagerChecker import UpdateManagerChecker
+from .models.UpdatesChecker import UpdatesChecker
+from .models.InstalledAppItem import InstalledAppItem
 from .models.Settings import Settings
 
 fetch_updates_cache = None
 
-class InstalledAppsList(Gtk.ScrolledWindow):
+class InstalledAppsList(Gtk.Box):
     __gsignals__ = {
         "selected-app": (GObject.SIGNAL_RUN_FIRST, GObject.TYPE_NONE, (object, )),
         "update-all": (GObject.SIGNAL_RUN_FIRST, GObject.TYPE_NONE, (object, )),
@@ -32,23 +34,44 @@ class InstalledAppsList(Gtk.ScrolledWindow):
     UPDATE_ALL_LABEL = _('Update all')
 
     def __init__(self):
-        super().__init__()
-        self.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
         clamp_size = 600
 
-        self.container_stack = Gtk.Stack(transition_type=Gtk.StackTransitionType.CROSSFADE)
-        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        self.container_stack = Gtk.Stack(transition_type=Gtk.StackTransitionType.CROSSFADE, vexpand=True)
 
         self.updates_fetched = False
 
-        self.installed_apps_list_slot = Gtk.Box()
-        self.installed_apps_list = Gtk.ListBox(css_classes=["boxed-list"])
-        self.installed_apps_list.connect('row-activated', self.on_activated_row)
+        # Rows are created only for the visible items of the model, and recycled while scrolling
+        self.apps_store = Gio.ListStore(item_type=InstalledAppItem)
+        self.items_by_path: Dict[str, InstalledAppItem] = {}
+        self.list_load_id = 0
 
-        self.installed_apps_list_slot.append(self.installed_apps_list)
+        self.apps_filter = Gtk.CustomFilter.new(self.filter_installed_apps_list)
+        self.filter_model = Gtk.FilterListModel(model=self.apps_store, filter=self.apps_filter)
 
-        self.installed_apps_list_rows: List[AppListBoxItem] = []
-        self.no_apps_found_row = NoAppsFoundRow(visible=False)
+        apps_sorter = Gtk.StringSorter(expression=Gtk.PropertyExpression.new(InstalledAppItem, None, 'sort-key'))
+        self.sort_model = Gtk.SortListModel(model=self.filter_model, sorter=apps_sorter)
+
+        list_item_factory = Gtk.SignalListItemFactory()
+        list_item_factory.connect('setup', self.on_list_item_setup)
+        list_item_factory.connect('bind', self.on_list_item_bind)
+        list_item_factory.connect('unbind', self.on_list_item_unbind)
+
+        self.installed_apps_list = Gtk.ListView(
+            model=Gtk.NoSelection(model=self.sort_model),
+            factory=list_item_factory,
+            single_click_activate=True,
+            css_classes=['installed-apps-list'],
+            margin_bottom=20,
+        )
+
+        self.installed_apps_list.connect('activate', self.on_activated_row)
+
+        self.file_monitors: List[Gio.FileMonitor] = []
+        self.sync_list_source_id: Optional[int] = None
+
+        self.no_apps_found_list = Gtk.ListBox(css_classes=["boxed-list"], selection_mode=Gtk.SelectionMode.NONE, visible=False)
+        self.no_apps_found_list.append(NoAppsFoundRow())
 
         # Create the filter search bar
         self.filter_query: str = ''
@@ -81,12 +104,19 @@ class InstalledAppsList(Gtk.ScrolledWindow):
         title_row.append(self.updates_btn)
         title_row.append(self.update_all_btn)
 
-        [self.main_box.append(el) for el in [title_row, self.installed_apps_list_slot]]
+        # the title stays in place, only the list is scrolled
+        title_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        [title_box.append(el) for el in [title_row, self.no_apps_found_list]]
+        title_clamp = Adw.Clamp(child=title_box, maximum_size=clamp_size, margin_top=20)
 
-        clamp = Adw.Clamp(child=self.main_box, maximum_size=clamp_size, margin_top=20, margin_bottom=20)
+        list_scrolled_window = Gtk.ScrolledWindow(
+            hscrollbar_policy=Gtk.PolicyType.NEVER,
+            vexpand=True,
+            child=Adw.ClampScrollable(child=self.installed_apps_list, maximum_size=clamp_size),
+        )
 
         self.clamp_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-        [self.clamp_container.append(el) for el in [self.filter_entry, clamp]]
+        [self.clamp_container.append(el) for el in [self.filter_entry, title_clamp, list_scrolled_window]]
 
         # empty list placeholder
         builder = Gtk.Builder.new_from_resource('/it/mijorus/gearlever/gtk/empty-list-placeholder.ui')
@@ -97,13 +127,48 @@ class InstalledAppsList(Gtk.ScrolledWindow):
         self.container_stack.add_child(self.clamp_container)
         self.container_stack.add_child(self.placeholder)
 
-        self.set_child(self.container_stack)
-        Settings.settings.connect('changed::appimages-default-folder', lambda *_: self.refresh_list())
+        self.append(self.container_stack)
+        Settings.settings.connect('changed::appimages-default-folder', self.on_default_folder_changed)
+        self.setup_file_monitors()
+
+    def on_list_item_setup(self, factory, list_item: Gtk.ListItem):
+        list_item.set_child(AppListItemContent())
+
+    def on_list_item_bind(self, factory, list_item: Gtk.ListItem):
+        item: InstalledAppItem = list_item.get_item()
+        content: AppListItemContent = list_item.get_child()
+
+        content.set_app(item.app)
+        content.set_update_version(item.app.version, item.app.size)
+        content.show_updatable_badge(item.updatable)
+
+        content._updatable_handler = item.connect('notify::updatable', lambda i, p: content.show_updatable_badge(i.updatable))
+        content._bound_item = item
+
+        content.set_icon(Gtk.Image(icon_name='gl-application-x-executable-symbolic'))
+        appimage_provider.get_icon_async(
+            item.app,
+            AppListItemContent.ICON_SIZE * content.get_scale_factor(),
+            lambda image: self.on_list_item_icon_loaded(content, item, image)
+        )
+
+    def on_list_item_icon_loaded(self, content: AppListItemContent, item: InstalledAppItem, image: Gtk.Image):
+        # the row might have been recycled for another app in the meantime
+        if content._bound_item is item:
+            content.set_icon(image)
+
+    def on_list_item_unbind(self, factory, list_item: Gtk.ListItem):
+        item: InstalledAppItem = list_item.get_item()
+        content: AppListItemContent = list_item.get_child()
+
+        item.disconnect(content._updatable_handler)
+        content._bound_item = None
 
     # Emit and event that changes the active page of the Stack in the parent widget
-    def on_activated_row(self, listbox, row: Gtk.ListBoxRow):
+    def on_activated_row(self, list_view: Gtk.ListView, position: int):
+        item: InstalledAppItem = self.sort_model.get_item(position)
         self.filter_entry.set_search_mode(False)
-        self.emit('selected-app', row._app)
+        self.emit('selected-app', item.app)
 
     def trigger_search_mode(self):
         self.filter_entry.set_search_mode(
@@ -111,32 +176,127 @@ class InstalledAppsList(Gtk.ScrolledWindow):
         )
 
     def refresh_list(self):
-        self.installed_apps_list.remove_all()
         self.updates_btn.set_label(self.CHECK_FOR_UPDATES_LABEL)
-        self.installed_apps_list_rows = []
+        self.update_all_btn.set_visible(False)
 
-        installed: List[AppImageListElement] = appimage_provider.list_installed()
+        self.apps_store.remove_all()
+        self.items_by_path = {}
+        self.sync_list()
+
+    def get_row_signature(self, el: AppImageListElement) -> tuple:
+        icon = el.desktop_entry.getIcon() if el.desktop_entry else None
+        return (el.name, el.description, el.version, el.size, el.file_path, el.external_folder, icon)
+
+    def sync_list(self):
+        """Applies to the list only the differences with the installed apps, instead of rebuilding every row"""
+        if self.sync_list_source_id:
+            GLib.source_remove(self.sync_list_source_id)
+            self.sync_list_source_id = None
+
+        if len(self.file_monitors) < 2:
+            # the AppImages folder might have been created after the list was loaded
+            self.setup_file_monitors()
+
+        self.list_load_id += 1
+        self.load_installed_apps(self.list_load_id)
+
+    @_async
+    def load_installed_apps(self, load_id: int):
+        installed = appimage_provider.list_installed()
+        self.apply_installed_apps(load_id, installed)
+
+    @idle
+    def apply_installed_apps(self, load_id: int, installed_list: List[AppImageListElement]):
+        if load_id != self.list_load_id:
+            # a newer list is being loaded
+            return
+
+        installed = {el.desktop_file_path: el for el in installed_list}
+        items_by_path = {}
+
+        for path, item in self.items_by_path.items():
+            el = installed.get(path, None)
+
+            if el and (self.get_row_signature(el) == item.signature):
+                items_by_path[path] = item
+                continue
+
+            logging.debug(f'Removing {path} from the installed apps list')
+            found, position = self.apps_store.find(item)
+
+            if found:
+                self.apps_store.remove(position)
+
+        new_items = []
+        for path, el in installed.items():
+            if path in items_by_path:
+                continue
 
-        for i in installed:
-            list_row = AppListBoxItem(i, activatable=True, selectable=False, hexpand=True)
-            list_row.set_update_version(i.version, i.size)
+            logging.debug(f'Adding {path} to the installed apps list')
+            item = InstalledAppItem(el, self.get_row_signature(el))
+            items_by_path[path] = item
+            new_items.append(item)
 
-            list_row.load_icon()
-            self.installed_apps_list_rows.append(list_row)
-            self.installed_apps_list.append(list_row)
+        if new_items:
+            self.apps_store.splice(self.apps_store.get_n_items(), 0, new_items)
+
+        # never modified after being assigned, so that update checks can read it from other threads
+        self.items_by_path = items_by_path
 
         if installed:
             self.container_stack.set_visible_child(self.clamp_container)
         else:
             self.container_stack.set_visible_child(self.placeholder)
 
-        self.installed_apps_list.append(self.no_apps_found_row)
-        self.no_apps_found_row.set_visible(False)
-        
-        self.installed_apps_list.set_sort_func(lambda r1, r2: self.sort_installed_apps_list(r1, r2))
-        self.installed_apps_list.invalidate_sort()
+        self.apps_filter.changed(Gtk.FilterChange.DIFFERENT)
+        self.update_no_apps_found_visibility()
 
-        self.update_all_btn.set_visible(False)
+        has_updatable_items = any([i.updatable for i in items_by_path.values()])
+        self.update_all_btn.set_visible(has_updatable_items)
+
+    def setup_file_monitors(self):
+        for monitor in self.file_monitors:
+            monitor.cancel()
+
+        self.file_monitors = []
+        monitored_folders = [
+            appimage_provider.user_desktop_files_path,
+            appimage_provider._get_appimages_default_destination_path(),
+        ]
+
+        for folder in monitored_folders:
+            if not os.path.isdir(folder):
+                continue
+
+            try:
+                monitor = Gio.File.new_for_path(folder).monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+                monitor.connect('changed', self.on_monitored_folder_changed)
+                self.file_monitors.append(monitor)
+            except Exception as e:
+                logging.warning(f'Cannot monitor {folder}: {e}')
+
+    def on_monitored_folder_changed(self, monitor, file: Gio.File, other_file: Optional[Gio.File], event: Gio.FileMonitorEvent):
+        if event in [Gio.FileMonitorEvent.CHANGED, Gio.FileMonitorEvent.PRE_UNMOUNT, Gio.FileMonitorEvent.UNMOUNTED]:
+            return
+
+        # hidden files, like the icons folder, never affect the list
+        if file.get_basename().startswith('.'):
+            return
+
+        # Changes usually come in bursts, e.g. when an AppImage and its .desktop file are written
+        if self.sync_list_source_id:
+            GLib.source_remove(self.sync_list_source_id)
+
+        self.sync_list_source_id = GLib.timeout_add(500, self.on_sync_list_timeout)
+
+    def on_sync_list_timeout(self):
+        self.sync_list_source_id = None
+        self.sync_list()
+        return GLib.SOURCE_REMOVE
+
+    def on_default_folder_changed(self, *args):
+        self.setup_file_monitors()
+        self.sync_list()
 
     @_async
     def fetch_updates(self, cache=False):
@@ -173,29 +333,21 @@ class InstalledAppsList(Gtk.ScrolledWindow):
         GLib.idle_add(lambda: self.updates_btn.set_label(self.CHECKING_FOR_UPDATES_LABEL))
         GLib.idle_add(lambda: self.updates_btn.set_sensitive(False))
 
-        updatable_apps = 0
+        apps = [item.app for item in self.items_by_path.values()]
+        updatable_apps = len(apps)
         updates_available = 0
-        final_rows = []
-        for row in self.installed_apps_list_rows:
-            manager = UpdateManagerChecker.check_url_for_app(row._app)
+        final_apps = []
 
-            updatable_apps += 1
-            if not manager:
-                continue
-
-            logging.debug(f'Found app with update url: {manager.name}')
-
-            try:
-                status = manager.is_update_available()
-
-                if status:
-                    updates_available += 1
-                    final_rows.append(row)
-            except Exception as e:
-                logging.error(e)
+        for result in UpdatesChecker().iter_results(apps):
+            if result.available:
+                updates_available += 1
+                final_apps.append(result.el)
+                self.mark_as_updatable(result.el.desktop_file_path)
+            elif result.deferred:
+                logging.warning(f'Update check for {result.el.name} was deferred because of rate limits')
 
         self.updates_fetched = True
-        updatable_filepaths = [f._app.file_path for f in final_rows]
+        updatable_filepaths = [a.file_path for a in final_apps]
         fetch_updates_cache = {
             'updatable_filepaths': updatable_filepaths, 
             'updatable_apps': updatable_apps, 
@@ -205,11 +357,18 @@ class InstalledAppsList(Gtk.ScrolledWindow):
         sleep(1)
         self.complete_updates_fetch(updatable_filepaths, updatable_apps, updates_available)
 
+    @idle
+    def mark_as_updatable(self, desktop_file_path: str):
+        item = self.items_by_path.get(desktop_file_path)
+
+        if item:
+            item.updatable = True
+
     @idle
     def complete_updates_fetch(self, updatable_filepaths: list[str], updatable_apps: int, updates_available: int):
-        for row in self.installed_apps_list_rows:
-            if row._app.file_path in updatable_filepaths:
-                row.show_updatable_badge()
+        for item in self.items_by_path.values():
+            if item.app.file_path in updatable_filepaths:
+                item.updatable = True
 
         self.update_all_btn.set_visible(updates_available > 0)
         if updates_available == 0:
@@ -225,39 +384,22 @@ class InstalledAppsList(Gtk.ScrolledWindow):
         self.fetch_updates()
 
     def trigger_filter_list(self, widget):
-        if not self.installed_apps_list:
-            return
-
         self.filter_query = widget.get_text()
-        # self.installed_apps_list.invalidate_filter()
-
-        for row in self.installed_apps_list_rows:
-            if not getattr(row, 'force_show', False) and row._app.installed_status != InstalledStatus.INSTALLED:
-                row.set_visible(False)
-                continue
-
-            if not len(self.filter_query):
-                row.set_visible(True)
-                continue
-
-            visible = self.filter_query.lower().replace(' ', '') in row._app.name.lower()
-            row.set_visible(visible)
-            continue
+        self.apps_filter.changed(Gtk.FilterChange.DIFFERENT)
+        self.update_no_apps_found_visibility()
 
-        self.no_apps_found_row.set_visible(True)
-        for row in self.installed_apps_list_rows:
-            if row.get_visible():
-                self.no_apps_found_row.set_visible(False)
-                break
+    def filter_installed_apps_list(self, item: InstalledAppItem) -> bool:
+        if item.app.installed_status != InstalledStatus.INSTALLED:
+            return False
 
-    def sort_installed_apps_list(self, row: AppListBoxItem, row1: AppListBoxItem):
-        if (not hasattr(row1, '_app')):
-            return 1
+        if not len(self.filter_query):
+            return True
 
-        if (not hasattr(row, '_app')) or (row._app.name.lower() < row1._app.name.lower()):
-            return -1
+        return self.filter_query.lower().replace(' ', '') in item.search_key
 
-        return 1
+    def update_no_apps_found_visibility(self):
+        no_apps_found = bool(self.items_by_path) and self.filter_model.get_n_items() == 0
+        self.no_apps_found_list.set_visible(no_apps_found)
 
     def open_preferences(self, widget):
         pref = Preferences()
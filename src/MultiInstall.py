@@ -1,11 +1,14 @@
+import os
 import logging
+from typing import Optional
 from gi.repository import Gtk, GObject, Adw, Gdk, Gio, GLib
 
 from .models.AppListElement import InstalledStatus
 from .providers.AppImageProvider import AppImageListElement, AppImageUpdateLogic
 from .providers.providers_list import appimage_provider
 from .lib.async_utils import _async, idle, debounce
-from .lib.utils import get_application_window
+from .lib.utils import get_application_window, show_message_dialog
+from .models.Models import InternalError
 from .components.AppListBoxItem import AppListBoxItem
 
 class MultiInstall(Gtk.ScrolledWindow):
@@ -133,15 +136,55 @@ class MultiInstall(Gtk.ScrolledWindow):
             return
         
         self.install_all_btn.set_sensitive(False)
+        self.progress_bar.set_fraction(0)
+        self.progress_bar.set_visible(True)
 
-        for el in self.app_list:
-            if el.installed_status is InstalledStatus.INSTALLED:
-                continue
+        self.install_all()
+
+    @_async
+    def install_all(self):
+        to_install = [el for el in self.app_list if el.installed_status is not InstalledStatus.INSTALLED]
 
+        for el in to_install:
             el.set_trusted()
-            appimage_provider.install_file(el)
 
-        self.emit('go-back', True)
+        installed = []
+
+        @idle
+        def on_installed(el: AppImageListElement, error: Optional[Exception]):
+            installed.append(el)
+            self.progress_bar.set_fraction(len(installed) / len(to_install))
+
+            for row in self.app_list_box_items:
+                if row._app is el:
+                    row.set_opacity(1 if error else 0.5)
+
+        results = appimage_provider.install_files(to_install, callback=on_installed)
+        failed = [(el, error) for el, error in results if error]
+
+        for el, error in failed:
+            logging.error(f'{el.file_path} could not be installed: {error}')
+
+        if failed:
+            # the page stays open, so that the apps that were not installed are still listed
+            self.on_install_failed(failed)
+        else:
+            GLib.idle_add(lambda: self.emit('go-back', True))
+
+    @idle
+    def on_install_failed(self, failed: list[tuple[AppImageListElement, Exception]]):
+        self.progress_bar.set_visible(False)
+        self.install_all_btn.set_sensitive(self.count_not_installed() > 0)
+
+        lines = []
+        for el, error in failed:
+            message = error.message if isinstance(error, InternalError) else str(error)
+            lines.append(GLib.markup_escape_text(f'{os.path.basename(el.file_path)}: {message}'))
+
+        show_message_dialog(
+            '\n'.join(lines),
+            header=_('Some apps could not be moved to the app menu')
+        )
 
     def on_details_btn_clicked(self, widget: Gtk.Button, el: AppImageListElement):
         self.emit('show-details', el)
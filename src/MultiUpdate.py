@@ -6,7 +6,10 @@ from .providers.AppImageProvider import AppImageListElement, AppImageUpdateLogic
 from .providers.providers_list import appimage_provider
 from .lib.async_utils import _async, idle, debounce
 from .lib.utils import get_application_window
+from .lib import terminal
+from .models.UpdateManager import UpdateManager
 from .models.UpdateManagerChecker import UpdateManagerChecker
+from .models.UpdatesChecker import UpdatesChecker
 from .components.AppListBoxItem import AppListBoxItem
 
 class MultiUpdate(Gtk.ScrolledWindow):
@@ -19,6 +22,7 @@ class MultiUpdate(Gtk.ScrolledWindow):
         self.ACTION_ROW_ICON_SIZE = 45
 
         self.app_list: list[AppImageListElement] = []
+        self.update_managers: dict[str, UpdateManager] = {}
         self.app_list_box_items: list[AppListBoxItem] = []
         self.app_list_box = Gtk.ListBox(css_classes=['boxed-list'])
         self.current_update_manager = None
@@ -98,7 +102,7 @@ class MultiUpdate(Gtk.ScrolledWindow):
             if not self.green_light:
                 break
 
-            manager = UpdateManagerChecker.check_url_for_app(el)
+            manager = self.update_managers.get(el.file_path) or UpdateManagerChecker.check_url_for_app(el)
             self.current_update_manager = manager
             appimage_provider.update_from_url(manager, el, 
                 status_cb=lambda s: self.update_progress_fraction((s / p) * (i + 1)))
@@ -112,6 +116,7 @@ class MultiUpdate(Gtk.ScrolledWindow):
         self.progress_bar.set_fraction(0)
         self.app_list_box.remove_all()
         self.app_list = []
+        self.update_managers = {}
         self.app_list_box_items = []
         self.check_updatables()
 
@@ -119,18 +124,13 @@ class MultiUpdate(Gtk.ScrolledWindow):
     def check_updatables(self):
         installed = appimage_provider.list_installed()
 
-        for el in installed:
-            manager = UpdateManagerChecker.check_url_for_app(el)
-            if not manager:
-                continue
-
-            try:
-                if manager.is_update_available() and \
-                    (not appimage_provider.is_app_running(el)):
-                    self.app_list.append(el)
-                    self.create_app_row(el)
-            except Exception as e:
-                pass
+        with terminal.running_executables_snapshot():
+            for result in UpdatesChecker().iter_results(installed):
+                if result.available and \
+                    (not appimage_provider.is_app_running(result.el)):
+                    self.app_list.append(result.el)
+                    self.update_managers[result.el.file_path] = result.manager
+                    self.create_app_row(result.el)
 
         self.update_all()
 
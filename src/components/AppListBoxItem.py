@@ -9,45 +9,39 @@ from ..providers.AppImageProvider import AppImageListElement
 from ..providers.providers_list import appimage_provider
 
 
-class AppListBoxItem(Gtk.ListBoxRow):
-    __gsignals__ = {
-        "details-clicked": (GObject.SIGNAL_RUN_FIRST, GObject.TYPE_NONE, (object, )),
-    }
+class AppListItemContent(Gtk.Box):
+    """
+        The content of an app row; it can be assigned to a different app
+        any time, so that list views can recycle it
+    """
+    ICON_SIZE = 45
 
-    def __init__(self, list_element: AppImageListElement, show_details_btn=False, **kwargs):
-        super().__init__(**kwargs)
+    def __init__(self, show_details_btn=False):
+        super().__init__(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        self.set_css_classes(['app-listbox-item'])
 
-        self._app: AppImageListElement = list_element
         self.details_btn: Optional[Gtk.Button] = None
 
-        col = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
-        col.set_css_classes(['app-listbox-item'])
-
         self.image_container = Gtk.Box()
-        col.append(self.image_container)
+        self.append(self.image_container)
 
         app_details_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, valign=Gtk.Align.CENTER)
-        app_details_box.append(
-            Gtk.Label(
-                label=list_element.name,
-                halign=Gtk.Align.START,
-                # use_markup=True,
-                css_classes=['heading'],
-                max_width_chars=70,
-                ellipsize=Pango.EllipsizeMode.END
-            )
+
+        self.name_label = Gtk.Label(
+            halign=Gtk.Align.START,
+            # use_markup=True,
+            css_classes=['heading'],
+            max_width_chars=70,
+            ellipsize=Pango.EllipsizeMode.END
         )
 
-        if list_element.description:
-            app_details_box.append(
-                Gtk.Label(
-                    label=list_element.description, 
-                    halign=Gtk.Align.START,
-                    lines=1,
-                    max_width_chars=100, 
-                    ellipsize=Pango.EllipsizeMode.END,
-                )
-            )
+        self.description_label = Gtk.Label(
+            halign=Gtk.Align.START,
+            lines=1,
+            max_width_chars=100,
+            ellipsize=Pango.EllipsizeMode.END,
+            visible=False,
+        )
 
         self.update_version = Gtk.Label(
             label='',
@@ -56,15 +50,17 @@ class AppListBoxItem(Gtk.ListBoxRow):
             css_classes=['subtitle'],
         )
 
+        app_details_box.append(self.name_label)
+        app_details_box.append(self.description_label)
         app_details_box.append(self.update_version)
         app_details_box.set_hexpand(True)
-        col.append(app_details_box)
+        self.append(app_details_box)
 
         if show_details_btn:
             self.details_btn = Gtk.Button(icon_name='gl-right-symbolic',
                                      valign=Gtk.Align.CENTER)
 
-            col.append(self.details_btn)
+            self.append(self.details_btn)
 
         self.update_available_btn = Gtk.Button(
             icon_name='gl-software-update-available-symbolic',
@@ -74,19 +70,24 @@ class AppListBoxItem(Gtk.ListBoxRow):
             visible=False
         )
 
-        col.append(self.update_available_btn)
-        
-        self.set_child(col)
+        self.append(self.update_available_btn)
+
+    def set_app(self, list_element: AppImageListElement):
+        self.name_label.set_label(list_element.name)
+        self.description_label.set_label(list_element.description or '')
+        self.description_label.set_visible(bool(list_element.description))
 
-        if self._app.installed_status in [InstalledStatus.UPDATING, InstalledStatus.INSTALLING]:
+        if list_element.installed_status in [InstalledStatus.UPDATING, InstalledStatus.INSTALLING]:
             self.set_opacity(0.5)
+        else:
+            self.set_opacity(1)
 
-    def load_icon(self):
-        image = appimage_provider.get_icon(self._app)
-        self.set_icon(image)
-    
     def set_icon(self, image: Gtk.Image):
-        image.set_pixel_size(45)
+        child = self.image_container.get_first_child()
+        if child:
+            self.image_container.remove(child)
+
+        image.set_pixel_size(self.ICON_SIZE)
         self.image_container.append(image)
 
     def set_update_version(self, text: Optional[str], size: int):
@@ -95,10 +96,46 @@ class AppListBoxItem(Gtk.ListBoxRow):
         if text:
             c.append(text)
         c.append(gnu_naturalsize(size))
-        
 
         self.update_version.set_visible(True)
         self.update_version.set_label(' · '.join(c))
 
+    def show_updatable_badge(self, visible=True):
+        self.update_available_btn.set_visible(visible)
+
+
+class AppListBoxItem(Gtk.ListBoxRow):
+    __gsignals__ = {
+        "details-clicked": (GObject.SIGNAL_RUN_FIRST, GObject.TYPE_NONE, (object, )),
+    }
+
+    def __init__(self, list_element: AppImageListElement, show_details_btn=False, **kwargs):
+        super().__init__(**kwargs)
+
+        self._app: AppImageListElement = list_element
+
+        self.content = AppListItemContent(show_details_btn=show_details_btn)
+        self.content.set_app(list_element)
+
+        self.details_btn: Optional[Gtk.Button] = self.content.details_btn
+        self.update_available_btn = self.content.update_available_btn
+        self.update_version = self.content.update_version
+        self.image_container = self.content.image_container
+
+        self.set_child(self.content)
+
+    def load_icon(self):
+        appimage_provider.get_icon_async(
+            self._app,
+            AppListItemContent.ICON_SIZE * self.get_scale_factor(),
+            self.set_icon
+        )
+
+    def set_icon(self, image: Gtk.Image):
+        self.content.set_icon(image)
+
+    def set_update_version(self, text: Optional[str], size: int):
+        self.content.set_update_version(text, size)
+
     def show_updatable_badge(self):
-        self.update_available_btn.set_visible(True)
\ No newline at end of file
+        self.content.show_updatable_badge()
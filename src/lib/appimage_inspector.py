@@ -0,0 +1,193 @@
+import os
+import mmap
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+# https://github.com/AppImage/AppImageSpec/blob/master/draft.md
+
+ELF_MAGIC = b'\x7fELF'
+SQUASHFS_MAGIC = b'hsqs'
+DWARFS_MAGIC = b'DWARFS'
+ISO9660_MAGIC = b'CD001'
+ISO9660_MAGIC_OFFSET = 0x8001
+
+# DwarFS images are not always placed right after the runtime
+DWARFS_SEARCH_WINDOW = 4 * 1024 * 1024
+
+ELF_MACHINES = {
+    0x03: 'i386',
+    0x28: 'arm',
+    0x3E: 'x86_64',
+    0xB7: 'aarch64',
+}
+
+INSPECTED_SECTIONS = ['.upd_info', '.sha256_sig', '.sig_key']
+
+
+@dataclass
+class AppImageInfo():
+    architecture: Optional[str] = None
+    appimage_type: int = 0
+    payload_offset: int = 0
+    payload_format: Optional[str] = None
+    sections: dict = field(default_factory=dict)
+
+    @property
+    def upd_info(self) -> str:
+        return self.get_section_string('.upd_info')
+
+    @property
+    def signature(self) -> str:
+        return self.get_section_string('.sha256_sig')
+
+    @property
+    def signature_key(self) -> str:
+        return self.get_section_string('.sig_key')
+
+    def get_section_string(self, name: str) -> str:
+        data = self.sections.get(name, b'')
+        return data.split(b'\x00', 1)[0].decode('utf-8', errors='replace').strip()
+
+
+def parse_elf_header(header: bytes) -> Optional[dict]:
+    """Reads the fields of an ELF header that are needed to locate the section table"""
+    if len(header) < 64 or header[:4] != ELF_MAGIC:
+        return None
+
+    is_64 = header[4] == 2
+    byteorder = '>' if header[5] == 2 else '<'
+
+    machine, = struct.unpack_from(f'{byteorder}H', header, 18)
+
+    if is_64:
+        shoff, = struct.unpack_from(f'{byteorder}Q', header, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from(f'{byteorder}HHH', header, 0x3A)
+    else:
+        shoff, = struct.unpack_from(f'{byteorder}I', header, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from(f'{byteorder}HHH', header, 0x2E)
+
+    appimage_type = 0
+    if header[8:10] == b'AI' and header[10] in [1, 2]:
+        appimage_type = header[10]
+
+    return {
+        'is_64': is_64,
+        'byteorder': byteorder,
+        'architecture': ELF_MACHINES.get(machine, None),
+        'appimage_type': appimage_type,
+        'shoff': shoff,
+        'shentsize': shentsize,
+        'shnum': shnum,
+        'shstrndx': shstrndx,
+    }
+
+
+def _read_sections(mm: mmap.mmap, elf: dict) -> dict:
+    sections = {}
+    shoff, shentsize, shnum = elf['shoff'], elf['shentsize'], elf['shnum']
+
+    if not shnum or (shoff + shentsize * shnum) > len(mm) or elf['shstrndx'] >= shnum:
+        return sections
+
+    if elf['is_64']:
+        sh_format = f'{elf["byteorder"]}II8x8xQQ'
+    else:
+        sh_format = f'{elf["byteorder"]}II4x4xII'
+
+    headers = [struct.unpack_from(sh_format, mm, shoff + (i * shentsize)) for i in range(shnum)]
+    strtab_name, strtab_type, strtab_offset, strtab_size = headers[elf['shstrndx']]
+
+    for name_offset, sh_type, offset, size in headers:
+        name_start = strtab_offset + name_offset
+        name_end = mm.find(b'\x00', name_start, strtab_offset + strtab_size)
+
+        if name_end < 0:
+            continue
+
+        name = mm[name_start:name_end].decode('ascii', errors='replace')
+
+        # SHT_NOBITS sections have no content in the file
+        if name in INSPECTED_SECTIONS and sh_type != 8 and (offset + size) <= len(mm):
+            sections[name] = mm[offset:(offset + size)]
+
+    return sections
+
+
+def _detect_payload_format(mm: mmap.mmap, info: AppImageInfo) -> Optional[str]:
+    if info.appimage_type == 1 or mm[ISO9660_MAGIC_OFFSET:(ISO9660_MAGIC_OFFSET + 5)] == ISO9660_MAGIC:
+        if info.appimage_type == 1:
+            info.payload_offset = 0
+
+        return 'iso9660'
+
+    offset = info.payload_offset
+    if mm[offset:(offset + 4)] == SQUASHFS_MAGIC:
+        return 'squashfs'
+
+    dwarfs_offset = mm.find(DWARFS_MAGIC, offset, offset + DWARFS_SEARCH_WINDOW)
+    if dwarfs_offset >= 0:
+        info.payload_offset = dwarfs_offset
+        return 'dwarfs'
+
+    return None
+
+
+def _inspect(file_path: str) -> AppImageInfo:
+    info = AppImageInfo()
+
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return info
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            elf = parse_elf_header(mm[:64])
+
+            if not elf:
+                return info
+
+            info.architecture = elf['architecture']
+            info.appimage_type = elf['appimage_type']
+            info.payload_offset = elf['shoff'] + (elf['shentsize'] * elf['shnum'])
+            info.sections = _read_sections(mm, elf)
+            info.payload_format = _detect_payload_format(mm, info)
+
+    return info
+
+
+_cache_lock = threading.Lock()
+_cache: OrderedDict = OrderedDict()
+_CACHE_SIZE = 256
+
+
+def inspect_appimage(file_path: str) -> AppImageInfo:
+    """
+        Returns architecture, type, payload location and embedded sections of an AppImage,
+        reading the file only once for as long as it's not modified.
+    """
+    st = os.stat(file_path)
+    identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    with _cache_lock:
+        cached = _cache.get(file_path, None)
+
+        if cached and cached[0] == identity:
+            _cache.move_to_end(file_path)
+            return cached[1]
+
+    try:
+        info = _inspect(file_path)
+    except Exception as e:
+        logging.error(f'Cannot inspect {file_path}: {e}')
+        info = AppImageInfo()
+
+    with _cache_lock:
+        _cache[file_path] = (identity, info)
+
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return info
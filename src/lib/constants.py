@@ -12,4 +12,5 @@ APP_DATA = {
 RUN_ID = ''.join((random.choice('abcdxyzpqr123456789') for i in range(10)))
 ONE_UPDATE_AVAILABLE_LABEL = _('1 update available')
 UPDATES_AVAILABLE_LABEL = _('{n} updates available')
-TMP_DIR = os.path.join(GLib.get_tmp_dir(), APP_ID + '-' + RUN_ID)
\ No newline at end of file
+TMP_DIR = os.path.join(GLib.get_tmp_dir(), APP_ID + '-' + RUN_ID)
+CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), APP_NAME)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+import time
+import hashlib
+import logging
+import platform
+from typing import Callable, Optional, BinaryIO
+
+from .appimage_inspector import parse_elf_header
+from .utils import DIGEST_ALGORITHMS
+
+# a read blocks until the buffer is full, so downloads start with small reads
+MIN_BUFFER_SIZE = 64 * 1024
+MAX_BUFFER_SIZE = 8 * 1024 * 1024
+
+# the buffer grows when a read fills it faster than this, and shrinks when
+# it takes much longer, so that progress and cancellation stay responsive on slow links
+TARGET_READ_TIME = 0.25
+
+# seconds between two progress updates
+PROGRESS_INTERVAL = 0.1
+
+# bytes needed to read the ELF header
+SNIFF_SIZE = 64
+
+# ELF machines that can run on each platform.machine()
+COMPATIBLE_ARCHITECTURES = {
+    'x86_64': ['x86_64', 'i386'],
+    'aarch64': ['aarch64'],
+}
+
+
+class InvalidDownloadError(Exception):
+    pass
+
+
+class ProgressThrottle():
+    """
+        Forwards progress to a callback at most once every PROGRESS_INTERVAL seconds;
+        the last update is always delivered
+    """
+
+    def __init__(self, callback: Callable[[float], None], interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.last_update = 0.0
+
+    def update(self, fraction: float, force=False):
+        now = time.monotonic()
+
+        if force or (now - self.last_update) >= self.interval:
+            self.last_update = now
+            self.callback(min(fraction, 1))
+
+
+class DownloadVerifier():
+    """
+        Computes the digests of a download while it is written and checks
+        that it starts like an AppImage built for this machine,
+        so that a wrong file is refused early and never read again
+    """
+
+    def __init__(self, expected_digests: Optional[dict[str, str]]=None, arch: Optional[str]=platform.machine()):
+        self.expected_digests = expected_digests or {}
+        self.arch = arch
+        self.hashes = {alg: hashlib.new(alg) for alg in DIGEST_ALGORITHMS}
+        self.header = bytearray()
+        self.header_checked = False
+
+    def update(self, data: memoryview):
+        if not self.header_checked:
+            self.header += data[:(SNIFF_SIZE - len(self.header))]
+
+            if len(self.header) >= SNIFF_SIZE:
+                self.check_header()
+
+        for h in self.hashes.values():
+            h.update(data)
+
+    def update_from_file(self, file_path: str, length: int):
+        """
+            Reads the first length bytes of a file, for downloads resumed from a partial file
+        """
+        buffer = memoryview(bytearray(MAX_BUFFER_SIZE))
+
+        with open(file_path, 'rb') as f:
+            while length:
+                n = f.readinto(buffer[:min(length, MAX_BUFFER_SIZE)])
+
+                if not n:
+                    break
+
+                self.update(buffer[:n])
+                length -= n
+
+    def check_header(self):
+        self.header_checked = True
+        elf = parse_elf_header(bytes(self.header))
+
+        if not elf:
+            if self.header.lstrip().startswith(b'<'):
+                raise InvalidDownloadError(_('The server returned a web page instead of an AppImage, please check if the provided URL is correct'))
+
+            raise InvalidDownloadError(_('The downloaded file is not a valid appimage, please check if the provided URL is correct'))
+
+        compatible = COMPATIBLE_ARCHITECTURES.get(self.arch, None)
+        if compatible and elf['architecture'] and elf['architecture'] not in compatible:
+            raise InvalidDownloadError(_('The downloaded AppImage is built for {arch}').format(arch=elf['architecture']))
+
+    def get_digests(self) -> dict[str, str]:
+        return {alg: h.hexdigest() for alg, h in self.hashes.items()}
+
+    def verify(self):
+        if not self.header_checked:
+            self.check_header()
+
+        digests = self.get_digests()
+
+        for alg, expected in self.expected_digests.items():
+            if alg in digests and digests[alg] != expected.lower():
+                raise InvalidDownloadError(_('The downloaded file is corrupted, its {alg} digest does not match').format(alg=alg.upper()))
+
+
+def get_reader(fobj) -> Callable[[memoryview], int]:
+    """
+        Returns a function reading from fobj into a buffer,
+        for file objects that do not implement readinto
+    """
+    readinto = getattr(fobj, 'readinto', None)
+
+    if readinto:
+        return readinto
+
+    def read_into(view: memoryview) -> int:
+        data = fobj.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    return read_into
+
+
+def preallocate(f: BinaryIO, offset: int, total_size: int) -> bool:
+    """
+        Reserves the disk space for the rest of the file, which avoids
+        fragmentation and fails early when the disk is full
+    """
+    if total_size <= offset:
+        return False
+
+    try:
+        os.posix_fallocate(f.fileno(), offset, total_size - offset)
+    except (OSError, AttributeError) as e:
+        # not supported by every filesystem
+        logging.debug(f'Cannot preallocate {total_size} bytes: {e}')
+        return False
+
+    return True
+
+
+def copy_stream(read_into: Callable[[memoryview], int], f: BinaryIO, offset: int,
+                total_size: int, progress: Optional[ProgressThrottle]=None,
+                verifier: Optional[DownloadVerifier]=None) -> int:
+    """
+        Copies everything read_into returns to f, at the current position,
+        using a single buffer between 64 KiB and 8 MiB; returns the number of bytes copied.
+        offset and total_size are only used to report progress.
+    """
+    buffer = memoryview(bytearray(MAX_BUFFER_SIZE))
+    buffer_size = MIN_BUFFER_SIZE
+    copied = 0
+
+    while True:
+        read_start = time.monotonic()
+        n = read_into(buffer[:buffer_size])
+
+        read_time = time.monotonic() - read_start
+
+        if not n:
+            break
+
+        if verifier:
+            verifier.update(buffer[:n])
+
+        f.write(buffer[:n])
+        copied += n
+
+        if n == buffer_size and read_time < (TARGET_READ_TIME / 2):
+            buffer_size = min(buffer_size * 2, MAX_BUFFER_SIZE)
+        elif read_time > (TARGET_READ_TIME * 2):
+            buffer_size = max(buffer_size // 2, MIN_BUFFER_SIZE)
+
+        if progress and total_size:
+            progress.update((offset + copied) / total_size)
+
+    if progress and total_size:
+        progress.update((offset + copied) / total_size, force=True)
+
+    return copied
@@ -0,0 +1,110 @@
+import os
+import errno
+import fcntl
+import shutil
+import logging
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+# errors meaning that a faster method is not available for these files
+UNSUPPORTED_ERRORS = [errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS]
+
+
+def _clone(src_fd: int, dest_fd: int) -> bool:
+    """
+        Shares the blocks of the source with the destination, on filesystems
+        supporting reflinks like btrfs and XFS; no data is copied
+    """
+    try:
+        fcntl.ioctl(dest_fd, FICLONE, src_fd)
+    except OSError as e:
+        if e.errno in UNSUPPORTED_ERRORS:
+            return False
+
+        raise e
+
+    return True
+
+
+def _copy_range(src_fd: int, dest_fd: int, size: int) -> bool:
+    """
+        Copies the file inside the kernel, which can also
+        use server side copies on network filesystems
+    """
+    if not hasattr(os, 'copy_file_range'):
+        return False
+
+    copied = 0
+
+    while copied < size:
+        try:
+            n = os.copy_file_range(src_fd, dest_fd, size - copied)
+        except OSError as e:
+            if copied == 0 and e.errno in UNSUPPORTED_ERRORS:
+                return False
+
+            raise e
+
+        if not n:
+            # some virtual filesystems report nothing to copy
+            if copied == 0:
+                return False
+
+            break
+
+        copied += n
+
+    return True
+
+
+def copy_file(src: str, dest: str) -> str:
+    """
+        Copies src to dest, replacing it, with the fastest method available:
+        reflink, copy_file_range and then a regular copy.
+        dest is written under a temporary name and replaced atomically;
+        returns the method used.
+    """
+    tmp_dest = os.path.join(os.path.dirname(dest), f'.{os.path.basename(dest)}.{os.getpid()}.tmp')
+
+    try:
+        with open(src, 'rb') as src_f, open(tmp_dest, 'wb') as dest_f:
+            size = os.fstat(src_f.fileno()).st_size
+
+            if _clone(src_f.fileno(), dest_f.fileno()):
+                method = 'reflink'
+            elif _copy_range(src_f.fileno(), dest_f.fileno(), size):
+                method = 'copy_file_range'
+            else:
+                shutil.copyfileobj(src_f, dest_f, length=(8 * 1024 * 1024))
+                method = 'copy'
+
+        shutil.copymode(src, tmp_dest)
+        os.replace(tmp_dest, dest)
+    except Exception as e:
+        if os.path.exists(tmp_dest):
+            os.remove(tmp_dest)
+
+        raise e
+
+    logging.debug(f'Copied {src} to {dest} with {method}')
+    return method
+
+
+def move_file(src: str, dest: str) -> str:
+    """
+        Moves src to dest, replacing it: a rename within the same filesystem,
+        otherwise a copy followed by the removal of src; returns the method used
+    """
+    try:
+        os.rename(src, dest)
+        logging.debug(f'Renamed {src} to {dest}')
+        return 'rename'
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise e
+
+    method = copy_file(src, dest)
+    os.remove(src)
+
+    return method
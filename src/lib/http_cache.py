@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .constants import CACHE_DIR
+from .http_session import session
+
+MAX_ENTRIES = 512
+
+# headers describing the body, which are kept from the stored response on revalidation
+BODY_HEADERS = ['content-type', 'etag', 'last-modified']
+
+# request headers that can change the response, which are part of the cache key
+VARY_HEADERS = ['authorization', 'accept', 'accept-language']
+
+
+class HttpCache():
+    """
+        Stores GET responses in the user cache folder together with their
+        ETag and Last-Modified validators and revalidates them with conditional requests:
+        when the server replies 304 Not Modified the stored body is returned.
+
+        Each entry is a single file, a line of JSON metadata followed by the body,
+        keyed by the URL and by the request headers in VARY_HEADERS.
+    """
+
+    def __init__(self):
+        self.folder = os.path.join(CACHE_DIR, 'http')
+        self._lock = threading.Lock()
+
+    def _get_path(self, url: str, headers: dict) -> str:
+        headers = CaseInsensitiveDict(headers)
+        key_data = json.dumps([url, *[headers.get(h, '') for h in VARY_HEADERS]])
+        key = hashlib.sha1(key_data.encode()).hexdigest()
+
+        return os.path.join(self.folder, f'{key}.cache')
+
+    def _read(self, path: str, url: str) -> Optional[tuple[dict, bytes]]:
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.debug(f'Cannot read cached response for {url}: {e}')
+            return None
+
+        if meta.get('url') != url:
+            return None
+
+        return meta, body
+
+    def _write(self, path: str, url: str, resp: requests.Response):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+
+        meta = {
+            'url': url,
+            'headers': {k: v for k, v in resp.headers.items() if k.lower() in BODY_HEADERS},
+            'encoding': resp.encoding,
+            'stored_at': time.time(),
+        }
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+
+            # the metadata and the body are replaced together
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(meta).encode() + b'\n')
+                f.write(resp.content)
+
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(f'Cannot cache response for {url}: {e}')
+
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            return
+
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.folder) if e.name.endswith('.cache')]
+            except OSError:
+                return
+
+            if len(entries) <= MAX_ENTRIES:
+                return
+
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:len(entries) - MAX_ENTRIES]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _make_response(self, path: str, url: str, meta: dict, body: bytes, fresh: requests.Response) -> requests.Response:
+        headers = CaseInsensitiveDict(fresh.headers)
+        headers.pop('content-length', None)
+        headers.pop('content-encoding', None)
+
+        for k, v in meta['headers'].items():
+            headers[k] = v
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = 'OK'
+        resp.url = url
+        resp.headers = headers
+        resp.encoding = meta.get('encoding')
+        resp.request = fresh.request
+        resp._content = body
+        resp.from_cache = True
+
+        try:
+            # keeps the entry from being evicted
+            os.utime(path)
+        except OSError:
+            pass
+
+        return resp
+
+    def get(self, url: str, headers: Optional[dict]=None, **kwargs) -> requests.Response:
+        """
+            Same as session.get, but answered from the cache
+            when the resource has not changed
+        """
+        headers = dict(headers or {})
+        path = self._get_path(url, headers)
+        cached = self._read(path, url)
+
+        if cached:
+            meta, body = cached
+            stored_headers = CaseInsensitiveDict(meta['headers'])
+
+            if 'etag' in stored_headers:
+                headers['If-None-Match'] = stored_headers['etag']
+            if 'last-modified' in stored_headers:
+                headers['If-Modified-Since'] = stored_headers['last-modified']
+
+        resp = session.get(url, headers=headers, **kwargs)
+
+        if cached and resp.status_code == 304:
+            logging.debug(f'Cached response is still valid for {url}')
+            return self._make_response(path, url, meta, body, resp)
+
+        if resp.status_code == 200 and \
+            ('etag' in resp.headers or 'last-modified' in resp.headers):
+            self._write(path, url, resp)
+
+        return resp
+
+
+http_cache = HttpCache()
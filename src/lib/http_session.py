@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) in seconds; the read timeout is the maximum time between two bytes
+DEFAULT_TIMEOUT = (10, 30)
+POOL_SIZE = 16
+RETRY_STATUSES = [500, 502, 503, 504]
+
+# consecutive failures after which requests to a host are refused for CIRCUIT_BREAKER_COOLDOWN seconds
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_COOLDOWN = 60
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class CircuitBreaker():
+    """
+        Stops contacting a host that keeps failing; after the cooldown
+        a single request is let through to probe it again
+    """
+
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures: dict[str, int] = {}
+        self.opened_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def check(self, host: str):
+        with self._lock:
+            opened_at: Optional[float] = self.opened_at.get(host)
+
+            if opened_at is None:
+                return
+
+            if (time.monotonic() - opened_at) < self.cooldown:
+                raise CircuitOpenError(f'Too many failed requests to {host}, retrying later')
+
+            # half open: move the deadline forward so that only this request probes the host
+            self.opened_at[host] = time.monotonic()
+
+    def record_success(self, host: str):
+        with self._lock:
+            self.failures.pop(host, None)
+            self.opened_at.pop(host, None)
+
+    def record_failure(self, host: str):
+        with self._lock:
+            self.failures[host] = self.failures.get(host, 0) + 1
+
+            if self.failures[host] >= self.threshold:
+                if host not in self.opened_at:
+                    logging.warning(f'Too many failed requests to {host}, pausing requests for {self.cooldown}s')
+
+                self.opened_at[host] = time.monotonic()
+
+
+class HttpSession(requests.Session):
+    """
+        A requests session shared by the whole app: connections are kept alive
+        and reused across threads, every request has a timeout, idempotent requests
+        are retried with exponential backoff and failing hosts are paused.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        retry = Retry(
+            total=3,
+            connect=2,
+            read=2,
+            status=2,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+        self.circuit_breaker = CircuitBreaker()
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        host = urlsplit(url).netloc
+
+        self.circuit_breaker.check(host)
+
+        try:
+            resp = super().request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.circuit_breaker.record_failure(host)
+            raise
+
+        if resp.status_code in RETRY_STATUSES:
+            self.circuit_breaker.record_failure(host)
+        else:
+            self.circuit_breaker.record_success(host)
+
+        return resp
+
+
+session = HttpSession()
@@ -0,0 +1,132 @@
+import os
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+
+from gi.repository import Gdk, GdkPixbuf  # noqa
+
+from .constants import CACHE_DIR
+
+
+class IconLoader():
+    """
+        Decodes icons at the size they are displayed at, on a pool of worker threads.
+        Results are kept in a bounded in-memory LRU and as PNG thumbnails on disk,
+        keyed by icon path, modification time and size; the least recently used
+        thumbnails are evicted when they exceed disk_cache_size bytes.
+    """
+
+    def __init__(self, max_workers=4, memory_cache_size=256, disk_cache_size=(20 * 1024 * 1024)):
+        self.thumbnails_folder = os.path.join(CACHE_DIR, 'thumbnails')
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='icon-loader')
+        self.memory_cache_size = memory_cache_size
+        self.disk_cache_size = disk_cache_size
+        self._memory_cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        # size of the thumbnails folder, measured when the first thumbnail is saved
+        self._disk_usage: Optional[int] = None
+
+    def _get_key(self, icon_path: str, size: int) -> Optional[str]:
+        try:
+            mtime_ns = os.stat(icon_path).st_mtime_ns
+        except OSError:
+            return None
+
+        return f'{icon_path}:{mtime_ns}:{size}'
+
+    def get_cached(self, icon_path: str, size: int) -> Optional[Gdk.Texture]:
+        """
+            Returns a texture that has already been decoded, without touching the disk
+        """
+        key = self._get_key(icon_path, size)
+
+        with self._lock:
+            if key in self._memory_cache:
+                self._memory_cache.move_to_end(key)
+                return self._memory_cache[key]
+
+        return None
+
+    def load(self, icon_path: str, size: int) -> Optional[Gdk.Texture]:
+        """
+            Returns the icon scaled to fit size x size pixels;
+            blocking, meant to be called from a worker thread
+        """
+        key = self._get_key(icon_path, size)
+        if not key:
+            return None
+
+        cached = self.get_cached(icon_path, size)
+        if cached:
+            return cached
+
+        thumbnail_path = os.path.join(self.thumbnails_folder, hashlib.sha1(key.encode()).hexdigest() + '.png')
+        texture = None
+
+        try:
+            if os.path.isfile(thumbnail_path):
+                texture = Gdk.Texture.new_from_filename(thumbnail_path)
+                # the modification time tells which thumbnails were used last
+                os.utime(thumbnail_path)
+        except Exception as e:
+            logging.debug(f'Cannot load thumbnail {thumbnail_path}: {e}')
+
+        if not texture:
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(icon_path, size, size, True)
+            except Exception as e:
+                logging.warning(f'Cannot load icon {icon_path}: {e}')
+                return None
+
+            texture = Gdk.Texture.new_for_pixbuf(pixbuf)
+
+            try:
+                os.makedirs(self.thumbnails_folder, exist_ok=True)
+                tmp_path = f'{thumbnail_path}.{threading.get_ident()}.tmp'
+                pixbuf.savev(tmp_path, 'png', [], [])
+                os.replace(tmp_path, thumbnail_path)
+                self._add_to_disk_cache(thumbnail_path)
+            except Exception as e:
+                logging.debug(f'Cannot save thumbnail {thumbnail_path}: {e}')
+
+        with self._lock:
+            self._memory_cache[key] = texture
+
+            while len(self._memory_cache) > self.memory_cache_size:
+                self._memory_cache.popitem(last=False)
+
+        return texture
+
+    def _add_to_disk_cache(self, thumbnail_path: str):
+        with self._disk_lock:
+            if self._disk_usage is None:
+                self._disk_usage = sum([e.stat().st_size for e in os.scandir(self.thumbnails_folder) if e.is_file()])
+            else:
+                self._disk_usage += os.path.getsize(thumbnail_path)
+
+            if self._disk_usage > self.disk_cache_size:
+                self._evict()
+
+    def _evict(self):
+        entries = [(e.path, e.stat()) for e in os.scandir(self.thumbnails_folder) if e.is_file()]
+        total_size = sum([s.st_size for p, s in entries])
+
+        for path, stat in sorted(entries, key=lambda e: e[1].st_mtime):
+            if total_size <= self.disk_cache_size:
+                break
+
+            try:
+                os.remove(path)
+                total_size -= stat.st_size
+            except OSError as e:
+                logging.debug(f'Cannot remove thumbnail {path}: {e}')
+
+        logging.debug(f'Thumbnails cache reduced to {total_size} bytes')
+        self._disk_usage = total_size
+
+    def submit(self, func, *args) -> Future:
+        return self.executor.submit(func, *args)
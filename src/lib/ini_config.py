@@ -1,8 +1,12 @@
 import gi
 import os
+import shutil
 import configparser
 import hashlib
 import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
@@ -11,8 +15,19 @@ from gi.repository import GLib  # noqa
 
 
 class Config:
+    """
+        The configuration of the integrated apps, stored in an INI file.
+        Every access goes through a lock, as the parser is shared by the UI
+        and by background threads; changes made while a transaction() is open
+        are written when the last open transaction, of any thread, ends.
+    """
     path = os.path.join(GLib.get_user_config_dir(), 'gearlever.conf')
     parser = configparser.ConfigParser(interpolation=None)
+    lock = threading.RLock()
+    _dirty = False
+    _transactions = threading.local()
+    # threads with an open transaction
+    _open_transactions = 0
 
     @staticmethod
     def return_boolean(v):
@@ -24,14 +39,102 @@ class Config:
 
     @staticmethod
     def refresh():
-        if Config.exists():
-            Config.parser.read(Config.path)
+        with Config.lock:
+            if Config.exists():
+                Config.parser.read(Config.path)
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+            Groups many changes in a single write; can also decorate functions
+        """
+        depth = getattr(Config._transactions, 'depth', 0)
+        Config._transactions.depth = depth + 1
+
+        if depth == 0:
+            with Config.lock:
+                Config._open_transactions += 1
+
+        try:
+            yield
+        except BaseException as e:
+            if Config._end_transaction(depth):
+                try:
+                    # the changes made before the error are kept
+                    Config.flush()
+                except Exception as flush_error:
+                    logging.error(f'Cannot write config: {flush_error}')
+
+            raise e
+
+        if Config._end_transaction(depth):
+            Config.flush()
+
+    @staticmethod
+    def _end_transaction(depth: int) -> bool:
+        """
+            Returns True if no transaction is left open and the changes can be written
+        """
+        Config._transactions.depth = depth
+
+        if depth:
+            return False
+
+        with Config.lock:
+            Config._open_transactions -= 1
+            return Config._open_transactions == 0
 
     @staticmethod
     def write():
-        logging.info(f'Writing config to {Config.path}')
-        with open(Config.path, 'w') as f:
-            Config.parser.write(f)
+        """
+            Marks the configuration as changed and saves it, unless a transaction is open in any thread
+        """
+        with Config.lock:
+            Config._dirty = True
+
+            # other threads may be in the middle of a transaction
+            if not Config._open_transactions:
+                Config.flush()
+
+    @staticmethod
+    def flush():
+        with Config.lock:
+            if not Config._dirty:
+                return
+
+            logging.info(f'Writing config to {Config.path}')
+            tmp_path = f'{Config.path}.{os.getpid()}.tmp'
+
+            try:
+                # a crash while writing leaves the previous file untouched
+                with open(tmp_path, 'w') as f:
+                    Config.parser.write(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                if os.path.exists(Config.path):
+                    shutil.copymode(Config.path, tmp_path)
+
+                os.replace(tmp_path, Config.path)
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+                raise e
+
+            Config._dirty = False
+
+    @staticmethod
+    def get_default(key: str, fallback: Optional[str]=None) -> Optional[str]:
+        with Config.lock:
+            return Config.parser.defaults().get(key, fallback)
+
+    @staticmethod
+    def set_default(key: str, value: str):
+        with Config.lock:
+            Config.parser[Config.parser.default_section][key] = value
+            Config.write()
 
     @staticmethod
     def get_app_hash(el):
@@ -42,8 +145,9 @@ class Config:
         h = Config.get_app_hash(el)
         k = f'app.{h}'
 
-        if Config.parser.has_section(k):
-            return dict(Config.parser[f'app.{h}'])
+        with Config.lock:
+            if Config.parser.has_section(k):
+                return dict(Config.parser[f'app.{h}'])
         return {}
 
     @staticmethod
@@ -52,12 +156,17 @@ class Config:
         j = f'app.{h}'
         k = f'app.{h}.update_manager'
 
-        for l in [j, k]:
-            if Config.parser.has_section(l):
-                logging.info(f'Deleting config section {l}')
-                Config.parser.remove_section(l)
+        with Config.lock:
+            removed = False
+
+            for l in [j, k]:
+                if Config.parser.has_section(l):
+                    logging.info(f'Deleting config section {l}')
+                    Config.parser.remove_section(l)
+                    removed = True
 
-        Config.write()
+            if removed:
+                Config.write()
 
     @staticmethod
     def set_app_config(el, data: dict):
@@ -65,33 +174,39 @@ class Config:
         logging.info(f'Setting app config for {el.name} (app.{h}): {data}')
         data['name'] = el.name
         data['file_path'] = el.file_path
-        Config.parser[f'app.{h}'] = data
-        Config.write()
+
+        with Config.lock:
+            Config.parser[f'app.{h}'] = data
+            Config.write()
 
     @staticmethod
     def get_app_update_config(el):
         h = Config.get_app_hash(el)
         k = f'app.{h}.update_manager'
 
-        if not Config.parser.has_section(k):
-            Config.parser.add_section(k)
+        with Config.lock:
+            if not Config.parser.has_section(k):
+                Config.parser.add_section(k)
 
-        return Config.parser[f'app.{h}.update_manager']
+            return Config.parser[f'app.{h}.update_manager']
 
     @staticmethod
     def set_app_update_config(el, manager, data):
         h = Config.get_app_hash(el)
         logging.info(f'Setting update config for {el.name} (app.{h}.update_manager), manager={manager.name}: {data}')
-        Config.parser[f'app.{h}.update_manager'] = data
-        Config.parser[f'app.{h}.update_manager']['manager'] = manager.name
-        Config.write()
+
+        with Config.lock:
+            Config.parser[f'app.{h}.update_manager'] = data
+            Config.parser[f'app.{h}.update_manager']['manager'] = manager.name
+            Config.write()
 
     @staticmethod
     def delete_app_update_config(el):
         h = Config.get_app_hash(el)
         k = f'app.{h}.update_manager'
-        if Config.parser.has_section(k):
-            logging.info(f'Deleting update config section {k}')
-            Config.parser.remove_section(k)
 
-        Config.write()
\ No newline at end of file
+        with Config.lock:
+            if Config.parser.has_section(k):
+                logging.info(f'Deleting update config section {k}')
+                Config.parser.remove_section(k)
+                Config.write()
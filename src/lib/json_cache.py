@@ -0,0 +1,86 @@
+import os
+import json
+import logging
+import threading
+from typing import Optional
+
+from .constants import CACHE_DIR
+
+
+class JsonCache():
+    """
+        A small key-value store persisted as a JSON file in the user cache folder.
+        Changes are kept in memory until save() is called, then written atomically.
+    """
+
+    def __init__(self, name: str, version: int = 1):
+        self.path = os.path.join(CACHE_DIR, f'{name}.json')
+        self.version = version
+        self.lock = threading.RLock()
+        self._items: Optional[dict] = None
+        self._dirty = False
+
+    def _load(self) -> dict:
+        if self._items is not None:
+            return self._items
+
+        self._items = {}
+
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    content = json.load(f)
+
+                if content.get('version') == self.version:
+                    self._items = content.get('items', {})
+                else:
+                    logging.info(f'Discarding outdated cache file {self.path}')
+            except Exception as e:
+                logging.warning(f'Cannot read cache file {self.path}: {e}')
+
+        return self._items
+
+    def get(self, key: str, default=None):
+        with self.lock:
+            return self._load().get(key, default)
+
+    def set(self, key: str, value):
+        with self.lock:
+            self._load()[key] = value
+            self._dirty = True
+
+    def pop(self, key: str, default=None):
+        with self.lock:
+            items = self._load()
+
+            if key in items:
+                self._dirty = True
+
+            return items.pop(key, default)
+
+    def keys(self) -> list[str]:
+        with self.lock:
+            return list(self._load().keys())
+
+    def clear(self):
+        with self.lock:
+            self._items = {}
+            self._dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self._dirty:
+                return
+
+            try:
+                if not os.path.exists(CACHE_DIR):
+                    os.makedirs(CACHE_DIR)
+
+                tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump({'version': self.version, 'items': self._items}, f)
+
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except Exception as e:
+                logging.warning(f'Cannot write cache file {self.path}: {e}')
@@ -0,0 +1,157 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+from .constants import CACHE_DIR
+from .json_cache import JsonCache
+
+# last_used is written to disk at most once per interval, to avoid
+# rewriting the index every time an app is displayed
+TOUCH_INTERVAL = 60 * 60
+
+
+class MetadataCache():
+    """
+        Keeps the files extracted from AppImages (desktop entry and icon) across sessions.
+        Entries are keyed by the md5 of the AppImage and can be found by file identity
+        without hashing the file again; the least recently used are evicted first,
+        except the entries pinned while their files are in use.
+    """
+
+    def __init__(self):
+        self.folder = os.path.join(CACHE_DIR, 'metadata')
+        self.index = JsonCache('metadata_index')
+        self.locks: dict[str, threading.Lock] = {}
+        self.locks_lock = threading.Lock()
+        self.pins: dict[str, int] = {}
+
+    def get_folder(self, md5_hash: str) -> str:
+        return os.path.join(self.folder, md5_hash)
+
+    def get_lock(self, md5_hash: str) -> threading.Lock:
+        """
+            Held while the metadata of an AppImage is looked up and extracted
+        """
+        with self.locks_lock:
+            return self.locks.setdefault(md5_hash, threading.Lock())
+
+    def make_tmp_folder(self, md5_hash: str) -> str:
+        """
+            Creates an empty folder to extract an AppImage into, see store()
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f'.{md5_hash}.', dir=self.folder)
+
+    def pin(self, md5_hash: str) -> bool:
+        """
+            Keeps an entry from being evicted until unpin() is called;
+            returns False if the entry is no longer in the cache
+        """
+        with self.index.lock:
+            entry = self.index.get(md5_hash)
+
+            if not (entry and self._is_valid(md5_hash, entry)):
+                return False
+
+            self.pins[md5_hash] = self.pins.get(md5_hash, 0) + 1
+            return True
+
+    def unpin(self, md5_hash: str):
+        with self.index.lock:
+            self.pins[md5_hash] -= 1
+
+            if not self.pins[md5_hash]:
+                self.pins.pop(md5_hash)
+
+    def _is_valid(self, md5_hash: str, entry: dict) -> bool:
+        folder = self.get_folder(md5_hash)
+        return all([os.path.isfile(os.path.join(folder, f)) for f in entry['files']])
+
+    def _touch(self, md5_hash: str, entry: dict, identity: list[int]):
+        if identity not in entry['identities']:
+            # the same AppImage may be found both in the Downloads and in the AppImages folder
+            entry['identities'] = [*entry['identities'][-3:], identity]
+        elif (time.time() - entry['last_used']) < TOUCH_INTERVAL:
+            return
+
+        entry['last_used'] = time.time()
+        self.index.set(md5_hash, entry)
+        self.index.save()
+
+    def find_by_identity(self, identity: list[int]) -> Optional[str]:
+        """
+            Returns the md5 of a cached AppImage with the given identity
+        """
+        with self.index.lock:
+            for md5_hash in self.index.keys():
+                entry = self.index.get(md5_hash)
+
+                if identity in entry['identities'] and self._is_valid(md5_hash, entry):
+                    self._touch(md5_hash, entry, identity)
+                    return md5_hash
+
+        return None
+
+    def find_by_hash(self, md5_hash: str, identity: list[int]) -> bool:
+        with self.index.lock:
+            entry = self.index.get(md5_hash)
+
+            if entry and self._is_valid(md5_hash, entry):
+                self._touch(md5_hash, entry, identity)
+                return True
+
+        return False
+
+    def store(self, md5_hash: str, identity: list[int], max_size: int, extracted_folder: str):
+        """
+            Moves the files extracted in extracted_folder to get_folder(md5_hash), indexes them
+            and evicts older entries until the cache fits max_size bytes
+        """
+        folder = self.get_folder(md5_hash)
+
+        with self.index.lock:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.rename(extracted_folder, folder)
+
+            files = os.listdir(folder)
+            size = sum([os.path.getsize(os.path.join(folder, f)) for f in files])
+
+            self.index.set(md5_hash, {
+                'identities': [identity],
+                'files': files,
+                'size': size,
+                'last_used': time.time(),
+            })
+
+            self._evict(max_size, keep=md5_hash)
+            self.index.save()
+
+    def _evict(self, max_size: int, keep: str):
+        entries = [(k, self.index.get(k)) for k in self.index.keys()]
+        total_size = sum([e['size'] for k, e in entries])
+
+        for md5_hash, entry in sorted(entries, key=lambda e: e[1]['last_used']):
+            if total_size <= max_size:
+                break
+
+            if md5_hash == keep or md5_hash in self.pins:
+                continue
+
+            logging.debug(f'Evicting {md5_hash} from the metadata cache')
+            self.remove(md5_hash)
+            total_size -= entry['size']
+
+    def remove(self, md5_hash: str):
+        with self.index.lock:
+            self.index.pop(md5_hash)
+            shutil.rmtree(self.get_folder(md5_hash), ignore_errors=True)
+
+        with self.locks_lock:
+            lock = self.locks.get(md5_hash)
+
+            if lock and not lock.locked():
+                self.locks.pop(md5_hash)
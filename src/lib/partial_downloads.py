@@ -0,0 +1,174 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Iterator, BinaryIO
+
+from .download_engine import preallocate
+
+# files not resumed for this long are deleted from the download folder
+MAX_PARTIAL_AGE = 7 * 24 * 60 * 60
+
+# attempts made by a download before giving up; the wait between two attempts
+# starts at RETRY_BACKOFF seconds and doubles every time
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 2
+
+
+class IncompleteDownloadError(Exception):
+    pass
+
+
+class NotEnoughSpaceError(Exception):
+    pass
+
+
+def get_partial_path(folder: str, url: str, validator: Optional[str]) -> str:
+    """
+        The file where a download is kept while incomplete.
+        The validator (an ETag or the expected size) makes sure that
+        a partial file is never resumed with the content of a newer release.
+    """
+    key = hashlib.sha1(f'{url}\n{validator or ""}'.encode()).hexdigest()
+    return os.path.join(folder, f'{key}.part')
+
+
+def get_offset(part_path: str) -> int:
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+
+def get_if_range(part_path: str) -> Optional[str]:
+    """
+        The ETag or Last-Modified date of the response the partial file comes from,
+        used in the If-Range header to get the rest of the same file
+    """
+    try:
+        with open(f'{part_path}.if-range', 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def set_if_range(part_path: str, value: Optional[str]):
+    try:
+        if value:
+            with open(f'{part_path}.if-range', 'w') as f:
+                f.write(value)
+        else:
+            os.remove(f'{part_path}.if-range')
+    except OSError:
+        pass
+
+
+def discard(part_path: str):
+    for path in [part_path, f'{part_path}.if-range', f'{part_path}.allocated']:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def remove_stale(folder: str):
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return
+
+    now = time.time()
+    for entry in entries:
+        try:
+            # the change time is updated when a file is moved here, unlike the modification time
+            if entry.is_file() and (now - entry.stat().st_ctime) > MAX_PARTIAL_AGE:
+                logging.debug(f'Removing stale download {entry.path}')
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def prepare(folder: str, url: str, validator: Optional[str]) -> str:
+    remove_stale(folder)
+    os.makedirs(folder, exist_ok=True)
+
+    part_path = get_partial_path(folder, url, validator)
+
+    if os.path.exists(f'{part_path}.allocated'):
+        # left by a crash: the size of the file does not tell how much was downloaded
+        discard(part_path)
+
+    offset = get_offset(part_path)
+
+    if offset:
+        logging.info(f'Resuming download of {url} from byte {offset}')
+
+    return part_path
+
+
+@contextmanager
+def open_part(part_path: str, offset: int, total_size: int) -> Iterator[BinaryIO]:
+    """
+        Opens the partial file for writing at offset, with the space for the rest
+        of the file preallocated; when closed, the file is truncated to the data written
+    """
+    with open(part_path, 'r+b' if offset else 'wb') as f:
+        f.seek(offset)
+        allocated = False
+
+        if total_size > offset:
+            with open(f'{part_path}.allocated', 'w'):
+                pass
+
+            allocated = preallocate(f, offset, total_size)
+
+        try:
+            yield f
+        finally:
+            if allocated:
+                f.truncate(f.tell())
+
+            try:
+                os.remove(f'{part_path}.allocated')
+            except FileNotFoundError:
+                pass
+
+
+def check_free_space(folder: str, size: int):
+    """
+        Raises NotEnoughSpaceError if size bytes cannot be written in folder
+    """
+    try:
+        st = os.statvfs(folder)
+    except OSError as e:
+        logging.debug(f'Cannot check the free space in {folder}: {e}')
+        return
+
+    available = st.f_bavail * st.f_frsize
+
+    if size > available:
+        raise NotEnoughSpaceError(_('Not enough free space in {folder}: {needed} MB needed, {available} MB available').format(
+            folder=folder, needed=(size // (1024 * 1024)) + 1, available=(available // (1024 * 1024))
+        ))
+
+
+def complete(part_path: str, dest: str) -> str:
+    os.replace(part_path, dest)
+    set_if_range(part_path, None)
+    return dest
+
+
+def wait_before_retry(attempt: int, error: Exception, cancelled: threading.Event) -> bool:
+    """
+        Returns False if the download should not be retried,
+        because it was cancelled or it failed too many times
+    """
+    if cancelled.is_set() or (attempt + 1) >= MAX_ATTEMPTS:
+        return False
+
+    delay = RETRY_BACKOFF * (2 ** attempt)
+    logging.warning(f'Download interrupted ({error}), retrying in {delay}s ({attempt + 1}/{MAX_ATTEMPTS - 1})')
+
+    return not cancelled.wait(delay)
@@ -0,0 +1,36 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+
+class SingleFlight():
+    """
+        Runs a function at most once per key: concurrent and later callers
+        with the same key wait for the first call and share its result or exception.
+        Results are kept until reset() is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            is_owner = future is None
+
+            if is_owner:
+                future = Future()
+                self._calls[key] = future
+
+        if is_owner:
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        return future.result()
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}
@@ -0,0 +1,443 @@
+import mmap
+import zlib
+import lzma
+import struct
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# https://dr-emann.github.io/squashfs/squashfs.html
+
+SQUASHFS_MAGIC = b'hsqs'
+SUPERBLOCK_FORMAT = '<4sIIIIHHHHHHQQQQQQQQ'
+SUPERBLOCK_SIZE = struct.calcsize(SUPERBLOCK_FORMAT)
+
+METADATA_BLOCK_SIZE = 8192
+METADATA_UNCOMPRESSED = 1 << 15
+DATA_BLOCK_UNCOMPRESSED = 1 << 24
+DATA_BLOCK_SIZE_MASK = DATA_BLOCK_UNCOMPRESSED - 1
+FRAGMENT_ENTRY_SIZE = 16
+NO_FRAGMENT = 0xFFFFFFFF
+
+INODE_BASIC_DIR = 1
+INODE_BASIC_FILE = 2
+INODE_BASIC_SYMLINK = 3
+INODE_EXT_DIR = 8
+INODE_EXT_FILE = 9
+INODE_EXT_SYMLINK = 10
+
+MAX_SYMLINK_DEPTH = 16
+FRAGMENT_CACHE_SIZE = 8
+
+COMPRESSION_NAMES = {
+    1: 'gzip',
+    2: 'lzma',
+    3: 'lzo',
+    4: 'xz',
+    5: 'lz4',
+    6: 'zstd',
+}
+
+
+class SquashFsError(Exception):
+    pass
+
+
+class UnsupportedCompressionError(SquashFsError):
+    pass
+
+
+def _get_zstd_decompressor() -> Optional[Callable]:
+    try:
+        # Python 3.14+
+        from compression import zstd
+        return lambda data, max_size: zstd.decompress(data)
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+        return lambda data, max_size: zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size)
+    except ImportError:
+        pass
+
+    return None
+
+
+def _get_lz4_decompressor() -> Optional[Callable]:
+    try:
+        import lz4.block
+        return lambda data, max_size: lz4.block.decompress(data, uncompressed_size=max_size)
+    except ImportError:
+        return None
+
+
+def _get_lzo_decompressor() -> Optional[Callable]:
+    try:
+        import lzo
+        return lambda data, max_size: lzo.decompress(data, False, max_size)
+    except ImportError:
+        return None
+
+
+def get_decompressor(compression_id: int) -> Optional[Callable]:
+    """
+        Returns a function that decompresses a single block, or None if
+        the compression algorithm is not available in this environment
+    """
+    if compression_id == 1:
+        return lambda data, max_size: zlib.decompress(data)
+    elif compression_id == 2:
+        return lambda data, max_size: lzma.decompress(data, format=lzma.FORMAT_ALONE)
+    elif compression_id == 3:
+        return _get_lzo_decompressor()
+    elif compression_id == 4:
+        return lambda data, max_size: lzma.decompress(data, format=lzma.FORMAT_XZ)
+    elif compression_id == 5:
+        return _get_lz4_decompressor()
+    elif compression_id == 6:
+        return _get_zstd_decompressor()
+
+    return None
+
+
+@dataclass
+class SquashFsInode():
+    inode_type: int
+    size: int = 0
+    dir_block: int = 0
+    dir_offset: int = 0
+    blocks_start: int = 0
+    block_sizes: tuple = ()
+    fragment: int = NO_FRAGMENT
+    fragment_offset: int = 0
+    symlink_target: str = ''
+
+    @property
+    def is_dir(self) -> bool:
+        return self.inode_type in [INODE_BASIC_DIR, INODE_EXT_DIR]
+
+    @property
+    def is_file(self) -> bool:
+        return self.inode_type in [INODE_BASIC_FILE, INODE_EXT_FILE]
+
+    @property
+    def is_symlink(self) -> bool:
+        return self.inode_type in [INODE_BASIC_SYMLINK, INODE_EXT_SYMLINK]
+
+
+class _MetadataCursor():
+    def __init__(self, reader: 'SquashFsReader', position: int, offset: int):
+        self.reader = reader
+        self.offset = offset
+        self.data, self.next_position = reader._read_metadata_block(position)
+
+    def read(self, length: int) -> bytes:
+        chunks = []
+
+        while length > 0:
+            if self.offset >= len(self.data):
+                self.offset -= len(self.data)
+                self.data, self.next_position = self.reader._read_metadata_block(self.next_position)
+
+                if not self.data:
+                    raise SquashFsError('Empty metadata block')
+
+                continue
+
+            chunk = self.data[self.offset:(self.offset + length)]
+            self.offset += len(chunk)
+            length -= len(chunk)
+            chunks.append(chunk)
+
+        return b''.join(chunks)
+
+    def unpack(self, fmt: str) -> tuple:
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))
+
+
+class SquashFsReader():
+    """
+        Read-only access to single files of a SquashFS image, like the ones embedded in type 2 AppImages.
+        Only the metadata and data blocks of the requested paths are decompressed.
+    """
+
+    def __init__(self, file_path: str, offset: int = 0):
+        self.offset = offset
+        self._file = open(file_path, 'rb')
+
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        self._metadata_cache = {}
+        self._inode_cache = {}
+        self._listing_cache = {}
+        self._fragment_cache = {}
+
+        try:
+            self._read_superblock()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _read(self, position: int, length: int) -> bytes:
+        start = self.offset + position
+
+        if position < 0 or (start + length) > len(self._mm):
+            raise SquashFsError('Unexpected end of the filesystem image')
+
+        return self._mm[start:(start + length)]
+
+    def _read_superblock(self):
+        (magic, inode_count, mtime, block_size, fragment_count, compression_id, block_log,
+            flags, id_count, version_major, version_minor, root_inode_ref, bytes_used,
+            id_table_start, xattr_table_start, inode_table_start, directory_table_start,
+            fragment_table_start, export_table_start) = struct.unpack(SUPERBLOCK_FORMAT, self._read(0, SUPERBLOCK_SIZE))
+
+        if magic != SQUASHFS_MAGIC:
+            raise SquashFsError('Not a squashfs filesystem')
+
+        if version_major != 4:
+            raise SquashFsError(f'Unsupported squashfs version {version_major}.{version_minor}')
+
+        if block_size != (1 << block_log):
+            raise SquashFsError('Corrupted squashfs superblock')
+
+        self.compression = COMPRESSION_NAMES.get(compression_id, str(compression_id))
+        self._decompressor = get_decompressor(compression_id)
+
+        if not self._decompressor:
+            raise UnsupportedCompressionError(f'{self.compression} compression is not supported')
+
+        self.block_size = block_size
+        self.fragment_count = fragment_count
+        self.root_inode_ref = root_inode_ref
+        self.inode_table_start = inode_table_start
+        self.directory_table_start = directory_table_start
+        self.fragment_table_start = fragment_table_start
+
+    def _decompress(self, data: bytes, max_size: int) -> bytes:
+        try:
+            return self._decompressor(data, max_size)
+        except Exception as e:
+            raise SquashFsError(f'Cannot decompress {self.compression} block: {e}')
+
+    def _read_metadata_block(self, position: int) -> tuple[bytes, int]:
+        if position in self._metadata_cache:
+            return self._metadata_cache[position]
+
+        header, = struct.unpack('<H', self._read(position, 2))
+        size = header & (METADATA_UNCOMPRESSED - 1)
+        data = self._read(position + 2, size)
+
+        if not (header & METADATA_UNCOMPRESSED):
+            data = self._decompress(data, METADATA_BLOCK_SIZE)
+
+        self._metadata_cache[position] = (data, position + 2 + size)
+        return self._metadata_cache[position]
+
+    def _read_inode(self, ref: int) -> SquashFsInode:
+        if ref in self._inode_cache:
+            return self._inode_cache[ref]
+
+        cursor = _MetadataCursor(self, self.inode_table_start + (ref >> 16), ref & 0xFFFF)
+
+        # skip permissions, uid, gid, mtime and inode number
+        inode_type, = cursor.unpack('<H14x')
+        inode = SquashFsInode(inode_type)
+
+        if inode_type == INODE_BASIC_DIR:
+            inode.dir_block, _, inode.size, inode.dir_offset, _ = cursor.unpack('<IIHHI')
+        elif inode_type == INODE_EXT_DIR:
+            _, inode.size, inode.dir_block, _, _, inode.dir_offset = cursor.unpack('<IIIIHH')
+        elif inode.is_file:
+            if inode_type == INODE_BASIC_FILE:
+                inode.blocks_start, inode.fragment, inode.fragment_offset, inode.size = cursor.unpack('<IIII')
+            else:
+                inode.blocks_start, inode.size, _, _, inode.fragment, inode.fragment_offset, _ = cursor.unpack('<QQQIIII')
+
+            if inode.fragment == NO_FRAGMENT:
+                blocks_count = -(-inode.size // self.block_size)
+            else:
+                blocks_count = inode.size // self.block_size
+
+            inode.block_sizes = cursor.unpack(f'<{blocks_count}I')
+        elif inode.is_symlink:
+            _, target_size = cursor.unpack('<II')
+            inode.symlink_target = cursor.read(target_size).decode('utf-8', errors='surrogateescape')
+
+        self._inode_cache[ref] = inode
+        return inode
+
+    def _list_directory(self, inode: SquashFsInode) -> dict[str, int]:
+        key = (inode.dir_block, inode.dir_offset)
+
+        if key in self._listing_cache:
+            return self._listing_cache[key]
+
+        entries = {}
+
+        # the stored size includes 3 bytes for the implicit "." and ".." entries
+        listing_size = inode.size - 3
+
+        if listing_size > 0:
+            cursor = _MetadataCursor(self, self.directory_table_start + inode.dir_block, inode.dir_offset)
+            read_size = 0
+
+            while read_size < listing_size:
+                count, inode_block, _ = cursor.unpack('<III')
+                read_size += 12
+
+                for i in range(count + 1):
+                    inode_offset, _, _, name_size = cursor.unpack('<HhHH')
+                    name = cursor.read(name_size + 1).decode('utf-8', errors='surrogateescape')
+                    read_size += 8 + name_size + 1
+
+                    entries[name] = (inode_block << 16) | inode_offset
+
+        self._listing_cache[key] = entries
+        return entries
+
+    def lookup(self, path: str, follow_symlinks=True) -> SquashFsInode:
+        """
+            Returns the inode of a path relative to the root of the filesystem.
+            Absolute symlinks are resolved against the root of the image, not the host.
+        """
+        root = self._read_inode(self.root_inode_ref)
+        current = root
+        parents: list[SquashFsInode] = []
+        components = [c for c in path.split('/') if c not in ['', '.']]
+        symlinks_followed = 0
+
+        while components:
+            name = components.pop(0)
+
+            if name == '..':
+                if parents:
+                    current = parents.pop()
+
+                continue
+
+            if not current.is_dir:
+                raise NotADirectoryError(path)
+
+            ref = self._list_directory(current).get(name, None)
+
+            if ref is None:
+                raise FileNotFoundError(path)
+
+            inode = self._read_inode(ref)
+
+            if inode.is_symlink and (components or follow_symlinks):
+                symlinks_followed += 1
+
+                if symlinks_followed > MAX_SYMLINK_DEPTH:
+                    raise SquashFsError(f'Too many levels of symbolic links in {path}')
+
+                if inode.symlink_target.startswith('/'):
+                    current = root
+                    parents = []
+
+                components = [c for c in inode.symlink_target.split('/') if c not in ['', '.']] + components
+                continue
+
+            parents.append(current)
+            current = inode
+
+        return current
+
+    def listdir(self, path: str = '/') -> list[str]:
+        inode = self.lookup(path)
+
+        if not inode.is_dir:
+            raise NotADirectoryError(path)
+
+        return list(self._list_directory(inode).keys())
+
+    def exists(self, path: str) -> bool:
+        try:
+            self.lookup(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+
+        return True
+
+    def is_file(self, path: str) -> bool:
+        try:
+            return self.lookup(path).is_file
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+
+    def _read_fragment(self, inode: SquashFsInode) -> bytes:
+        if inode.fragment >= self.fragment_count:
+            raise SquashFsError('Invalid fragment index')
+
+        if inode.fragment not in self._fragment_cache:
+            entries_per_block = METADATA_BLOCK_SIZE // FRAGMENT_ENTRY_SIZE
+            table_index, entry_index = divmod(inode.fragment, entries_per_block)
+
+            table_position, = struct.unpack('<Q', self._read(self.fragment_table_start + (table_index * 8), 8))
+            cursor = _MetadataCursor(self, table_position, entry_index * FRAGMENT_ENTRY_SIZE)
+            start, size, _ = cursor.unpack('<QII')
+
+            data = self._read(start, size & DATA_BLOCK_SIZE_MASK)
+            if not (size & DATA_BLOCK_UNCOMPRESSED):
+                data = self._decompress(data, self.block_size)
+
+            if len(self._fragment_cache) >= FRAGMENT_CACHE_SIZE:
+                self._fragment_cache.pop(next(iter(self._fragment_cache)))
+
+            self._fragment_cache[inode.fragment] = data
+
+        tail_size = inode.size % self.block_size
+        return self._fragment_cache[inode.fragment][inode.fragment_offset:(inode.fragment_offset + tail_size)]
+
+    def read_file(self, path: str, max_size: Optional[int] = None) -> bytes:
+        """
+            Returns the content of a regular file, following symlinks
+        """
+        inode = self.lookup(path)
+
+        if inode.is_dir:
+            raise IsADirectoryError(path)
+
+        if not inode.is_file:
+            raise SquashFsError(f'{path} is not a regular file')
+
+        if max_size is not None and inode.size > max_size:
+            raise SquashFsError(f'{path} is larger than {max_size} bytes')
+
+        chunks = []
+        position = inode.blocks_start
+
+        for block_size in inode.block_sizes:
+            size = block_size & DATA_BLOCK_SIZE_MASK
+
+            if size == 0:
+                # sparse block
+                chunks.append(bytes(self.block_size))
+                continue
+
+            data = self._read(position, size)
+            if not (block_size & DATA_BLOCK_UNCOMPRESSED):
+                data = self._decompress(data, self.block_size)
+
+            chunks.append(data)
+            position += size
+
+        if inode.fragment != NO_FRAGMENT:
+            chunks.append(self._read_fragment(inode))
+
+        return b''.join(chunks)[:inode.size]
@@ -1,22 +1,128 @@
 import subprocess
 import re
+import time
+import shlex
+import atexit
+import functools
 import threading
+from contextlib import contextmanager
 from typing import Callable, List, Union, Optional
 import logging
 import os
 
+# how long a list of running processes can be reused
+RUNNING_EXECUTABLES_TTL = 2
+
+_running_executables_lock = threading.Lock()
+_running_executables: tuple[float, set[str]] = (0, set())
+_running_executables_pins = 0
+
+# Reads one shell-quoted command per line and replies with "<exit status> <stdout size> <stderr size>",
+# followed by the content of stdout and stderr.
+# Every command gets new output files, and only the bytes counted are sent back:
+# a background process started by a command can keep writing to its files
+HOST_SHELL_SCRIPT = '''
+dir=$(mktemp -d) || exit 1
+trap 'rm -rf "$dir"' EXIT
+while IFS= read -r cmd; do
+    out=$(mktemp "$dir/out.XXXXXX") && err=$(mktemp "$dir/err.XXXXXX") || exit 1
+    (eval "$cmd") </dev/null >"$out" 2>"$err"
+    rc=$?
+    out_size=$(($(wc -c <"$out")))
+    err_size=$(($(wc -c <"$err")))
+    printf '%s %s %s\\n' "$rc" "$out_size" "$err_size"
+    head -c "$out_size" "$out"
+    head -c "$err_size" "$err"
+    rm -f "$out" "$err"
+done
+'''
+
+class HostShell():
+    """
+        A shell running on the host for the whole session, so that commands
+        don't need a new flatpak-spawn process each
+    """
+
+    def __init__(self):
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        logging.debug('Starting host shell')
+        self.process = subprocess.Popen(
+            ['flatpak-spawn', '--host', 'sh', '-c', HOST_SHELL_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def _run(self, command: List[str]) -> subprocess.CompletedProcess:
+        if not self.process or (self.process.poll() is not None):
+            self._start()
+
+        self.process.stdin.write((shlex.join(command) + '\n').encode())
+        self.process.stdin.flush()
+
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise BrokenPipeError('The host shell has been terminated')
+
+        returncode, stdout_size, stderr_size = [int(i) for i in header]
+        stdout = self.process.stdout.read(stdout_size)
+        stderr = self.process.stdout.read(stderr_size)
+
+        return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+
+    def run(self, command: List[str]) -> Optional[subprocess.CompletedProcess]:
+        """
+            Returns None if the command should be spawned directly,
+            because the shell is busy or not working
+        """
+        if any(['\n' in c for c in command]):
+            return None
+
+        if not self.lock.acquire(blocking=False):
+            return None
+
+        try:
+            return self._run(command)
+        except Exception as e:
+            logging.warning(f'Host shell failed, spawning {command[0]} directly: {e}')
+            self.stop()
+            return None
+        finally:
+            self.lock.release()
+
+    def stop(self):
+        if self.process:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=1)
+            except Exception:
+                self.process.kill()
+
+            self.process = None
+
+_host_shell = HostShell()
+atexit.register(_host_shell.stop)
+
 def is_flatpak():
     return os.environ.get('FLATPAK_ID', False) != False
 
-def host_sh(command: List[str], return_stderr=False, **kwargs) -> str:
+def host_sh(command: List[str], return_stderr=False, use_host_shell=True, **kwargs) -> str:
     try:
         cmd = [*command]
+        output = None
 
         if is_flatpak():
+            if use_host_shell and not kwargs:
+                logging.debug(f'Running {cmd} in the host shell')
+                output = _host_shell.run(cmd)
+
             cmd = ['flatpak-spawn', '--host', *cmd]
-        
-        logging.debug(f'Running {cmd}')
-        output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
+        if output is None:
+            logging.debug(f'Running {cmd}')
+            output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
         output.check_returncode()
     except subprocess.CalledProcessError as e:
         d = e.stderr.decode()
@@ -35,6 +141,17 @@ def host_sh(command: List[str], return_stderr=False, **kwargs) -> str:
     logging.debug(f'Done {cmd}')
     return re.sub(r'\n$', '', output_string)
 
+@functools.cache
+def host_has_command(name: str) -> bool:
+    """
+        Checks if an executable is available on the host; the result is kept for the whole session
+    """
+    try:
+        host_sh(['which', name])
+        return True
+    except Exception:
+        return False
+
 def sandbox_sh(command: List[str], return_stderr=False, error_quiet=False, **kwargs) -> str:
     try:
         cmd = [*command]
@@ -60,10 +177,11 @@ def sandbox_sh(command: List[str], return_stderr=False, error_quiet=False, **kwa
     logging.debug(f'Done {cmd}')
     return re.sub(r'\n$', '', output_string)
 
-def host_threaded_sh(command: List[str], callback: Optional[Callable[[str], None]]=None, return_stderr=False):
+def host_threaded_sh(command: List[str], callback: Optional[Callable[[str], None]]=None, return_stderr=False, long_running=False):
+    # long running commands, like apps, would keep the host shell busy until they exit
     def run_command(command: List[str], callback: Optional[Callable[[str], None]]=None):
         try:
-            output = host_sh(command, return_stderr)
+            output = host_sh(command, return_stderr, use_host_shell=(not long_running))
 
             if callback:
                 callback(output)
@@ -73,4 +191,44 @@ def host_threaded_sh(command: List[str], callback: Optional[Callable[[str], None
             raise e
 
     thread = threading.Thread(target=run_command, daemon=True, args=(command, callback, ))
-    thread.start()
\ No newline at end of file
+    thread.start()
+
+def get_running_executables() -> set[str]:
+    """
+        Returns the paths of the executables running on the host.
+        The process table is read once and shared by every call within RUNNING_EXECUTABLES_TTL seconds,
+        or within a running_executables_snapshot() block
+    """
+    global _running_executables
+
+    with _running_executables_lock:
+        updated_at, executables = _running_executables
+
+        if updated_at and (_running_executables_pins or (time.monotonic() - updated_at) < RUNNING_EXECUTABLES_TTL):
+            return executables
+
+        output = host_sh(['ps', '-eo', 'exe'])
+        executables = set([l.strip() for l in output.split('\n') if l.strip()])
+
+        _running_executables = (time.monotonic(), executables)
+        return executables
+
+@contextmanager
+def running_executables_snapshot():
+    """
+        Makes every get_running_executables() call in the block share the same
+        process table, which is read again when the first block starts
+    """
+    global _running_executables, _running_executables_pins
+
+    with _running_executables_lock:
+        if not _running_executables_pins:
+            _running_executables = (0, set())
+
+        _running_executables_pins += 1
+
+    try:
+        yield
+    finally:
+        with _running_executables_lock:
+            _running_executables_pins -= 1
@@ -7,14 +7,24 @@ import logging
 import shlex
 import gi
 import hashlib
-import requests
+import functools
+from .http_session import session
+from typing import Optional
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 
 from .async_utils import idle
+from .json_cache import JsonCache
 from gi.repository import Gtk, Gio, Adw, Gdk, GLib, GdkPixbuf  # noqa
 
+DIGEST_ALGORITHMS = ['md5', 'sha1', 'sha256']
+DIGEST_CHUNK_SIZE = 4 * 1024 * 1024
+# digests of the most recently used files that are kept, the least recently used are dropped first
+DIGEST_CACHE_SIZE = 256
+
+_digest_cache = JsonCache('file_digests')
+
 
 def key_in_dict(_dict: dict, key_lookup: str, separator='.'):
     """
@@ -82,15 +92,94 @@ def get_file_hash(file: Gio.File | None, alg='md5', file_path=None) -> str:
     if not file_path:
         file_path = file.get_path()
 
+    if alg not in DIGEST_ALGORITHMS:
+        raise Exception('Invalid hash requested')
+
+    return get_file_digests(file_path)[alg]
+
+
+def get_file_identity(file_path: str, stat_result: Optional[os.stat_result] = None) -> list[int]:
+    """
+        Returns a list of values that change whenever a file is replaced or modified:
+        device, inode, size and modification time in nanoseconds
+    """
+    st = stat_result or os.stat(file_path)
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def compute_file_digests(file_path: str) -> dict[str, str]:
+    """
+        Reads a file once, in fixed size chunks, and returns all the supported digests
+    """
+    hashes = {alg: hashlib.new(alg) for alg in DIGEST_ALGORITHMS}
+    buffer = bytearray(DIGEST_CHUNK_SIZE)
+    view = memoryview(buffer)
+
     with open(file_path, 'rb') as f:
-        if alg == 'md5':
-            return hashlib.md5(f.read()).hexdigest()
-        elif alg == 'sha1':
-            return hashlib.sha1(f.read()).hexdigest()
-        elif alg == 'sha256':
-            return hashlib.sha256(f.read()).hexdigest()
+        while (read_size := f.readinto(buffer)):
+            for h in hashes.values():
+                h.update(view[:read_size])
+
+    return {alg: h.hexdigest() for alg, h in hashes.items()}
+
+
+def get_file_digests(file_path: str) -> dict[str, str]:
+    """
+        Returns the md5, sha1 and sha256 of a file;
+        results are cached until the file is modified
+    """
+    identity = get_file_identity(file_path)
+    key = ':'.join([str(i) for i in identity])
+
+    cached = _digest_cache.get(key)
+    if cached:
+        _touch_digests(key, cached)
+        return cached
+
+    logging.debug(f'Computing digests of {file_path}')
+    digests = compute_file_digests(file_path)
+
+    # the file might have been changed while we were reading it
+    if get_file_identity(file_path) == identity:
+        _store_digests(key, digests)
+
+    return digests
+
+
+def store_file_digests(file_path: str, digests: dict[str, str]):
+    """
+        Records digests computed elsewhere, for example while downloading the file,
+        so that get_file_digests does not read it again
+    """
+    if set(digests.keys()) != set(DIGEST_ALGORITHMS):
+        raise Exception('Missing digests')
+
+    identity = get_file_identity(file_path)
+    _store_digests(':'.join([str(i) for i in identity]), digests)
+
+
+def _touch_digests(key: str, digests: dict[str, str]):
+    """
+        Moves a cache hit to the end of the eviction order; entries in the most
+        recent half are left in place, so that hits do not always rewrite the file
+    """
+    with _digest_cache.lock:
+        keys = _digest_cache.keys()
+
+        if key in keys[:len(keys) - (DIGEST_CACHE_SIZE // 2)]:
+            _digest_cache.pop(key)
+            _digest_cache.set(key, digests)
+            _digest_cache.save()
+
+
+def _store_digests(key: str, digests: dict[str, str]):
+    with _digest_cache.lock:
+        _digest_cache.set(key, digests)
+
+        for k in _digest_cache.keys()[:-DIGEST_CACHE_SIZE]:
+            _digest_cache.pop(k)
 
-    raise Exception('Invalid hash requested')
+        _digest_cache.save()
 
 
 def send_notification(notification=Gio.Notification, tag=None):
@@ -171,6 +260,7 @@ def show_message_dialog(message, header=None, markup=False):
     dialog.present()
 
 
+@functools.cache
 def get_osinfo():
     os_release_file = "/run/host/os-release"
     if os.environ.get('FLATPAK_ID', None) is None:
@@ -288,7 +378,7 @@ def check_internet(timeout=3):
 
     for url in urls:
         try:
-            r = requests.get(url=url, timeout=timeout, allow_redirects=False)
+            r = session.get(url=url, timeout=timeout, allow_redirects=False)
             if r.status_code < 400:
                 return True
         except Exception:
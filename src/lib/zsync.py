@@ -0,0 +1,446 @@
+import os
+import re
+import mmap
+import struct
+import time
+import hashlib
+import logging
+import posixpath
+import itertools
+from typing import Optional, Callable
+from urllib.parse import urlparse
+
+from .http_session import session
+from .utils import compute_file_digests
+
+# https://zsync.moria.org.uk/ - a .zsync control file starts with "Key: value" lines,
+# followed by an empty line and the checksums of each block of the target file
+
+# the first request for a header, which is retried with a larger range if needed
+HEADER_RANGE_SIZE = 4 * 1024
+MAX_HEADER_SIZE = 1024 * 1024
+# missing ranges closer than this are fetched with a single request
+RANGE_MERGE_GAP = 64 * 1024
+# share of the progress bar used by the scan of the local file
+SCAN_PROGRESS = 0.3
+# the scan is abandoned when, after this many bytes, less than
+# MIN_MATCH_RATIO of them were found in the target; a full download is faster
+MATCH_RATIO_CHECK_AFTER = 16 * 1024 * 1024
+MIN_MATCH_RATIO = 0.1
+# the scan is also abandoned when it takes longer than this share of the time
+# the full download is expected to take, measured by downloading SPEED_PROBE_SIZE bytes
+MAX_SCAN_TIME_RATIO = 0.5
+SPEED_PROBE_SIZE = 1024 * 1024
+
+
+class ZsyncError(Exception):
+    pass
+
+
+class ZsyncCancelledError(ZsyncError):
+    pass
+
+
+def parse_header(data: 'str | bytes') -> dict[str, str]:
+    if isinstance(data, bytes):
+        data = data.split(b'\n\n', 1)[0].decode('utf-8', errors='replace')
+    else:
+        data = data.split('\n\n', 1)[0]
+
+    header = {}
+    for line in data.splitlines():
+        k, sep, v = line.partition(':')
+
+        if sep:
+            header[k.strip()] = v.strip()
+
+    return header
+
+
+def fetch_header(url: str) -> dict[str, str]:
+    """
+        Fetches only the header of a control file, with Range requests
+        that grow until the empty line that ends it is received
+    """
+    range_size = HEADER_RANGE_SIZE
+
+    while range_size <= MAX_HEADER_SIZE:
+        data = b''
+
+        with session.get(url, headers={'Range': f'bytes=0-{range_size - 1}'}, stream=True) as resp:
+            resp.raise_for_status()
+
+            # servers that ignore the range send the whole file: stop reading at the end of the header
+            for chunk in resp.iter_content(1024):
+                data += chunk
+
+                if b'\n\n' in data:
+                    return parse_header(data)
+
+            if resp.status_code != 206 or len(data) < range_size:
+                return parse_header(data)
+
+        range_size *= 4
+
+    raise ZsyncError(f'The header of {url} is too large')
+
+
+def get_sha1(header: dict[str, str]) -> Optional[str]:
+    sha1 = header.get('SHA-1', '').lower()
+
+    if re.fullmatch(r'[0-9a-f]{40}', sha1):
+        return sha1
+
+    return None
+
+
+def get_target_url(header: dict[str, str], zsync_url: str) -> str:
+    """
+        The URL of the file described by the control file;
+        relative URLs are resolved against the location of the .zsync file
+    """
+    url = header.get('URL')
+
+    if not url:
+        return re.sub(r'\.zsync$', '', zsync_url)
+
+    if url.startswith('https://') or url.startswith('http://'):
+        return url
+
+    urlparsed = urlparse(zsync_url)
+    pp = posixpath.join(posixpath.dirname(urlparsed.path), url)
+    return urlparsed._replace(path=pp, query='', fragment='').geturl()
+
+
+def _md4_python(data: bytes) -> bytes:
+    # RFC 1320; OpenSSL 3 no longer provides MD4 by default
+    def lrot(x, n):
+        x &= 0xffffffff
+        return ((x << n) | (x >> (32 - n))) & 0xffffffff
+
+    length = len(data)
+    data = data + b'\x80' + (b'\x00' * ((55 - length) % 64)) + struct.pack('<Q', (length * 8) & 0xffffffffffffffff)
+    h = [0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476]
+
+    for offset in range(0, len(data), 64):
+        x = struct.unpack('<16I', data[offset:offset + 64])
+        a, b, c, d = h
+
+        for i in range(16):
+            k = i
+            a, b, c, d = d, lrot(a + ((b & c) | (~b & d)) + x[k], [3, 7, 11, 19][i % 4]), b, c
+
+        for i in range(16):
+            k = (i % 4) * 4 + i // 4
+            a, b, c, d = d, lrot(a + ((b & c) | (b & d) | (c & d)) + x[k] + 0x5a827999, [3, 5, 9, 13][i % 4]), b, c
+
+        for i in range(16):
+            k = [0, 8, 4, 12, 2, 10, 6, 14, 1, 9, 5, 13, 3, 11, 7, 15][i]
+            a, b, c, d = d, lrot(a + (b ^ c ^ d) + x[k] + 0x6ed9eba1, [3, 9, 11, 15][i % 4]), b, c
+
+        h = [(v + n) & 0xffffffff for v, n in zip(h, [a, b, c, d])]
+
+    return struct.pack('<4I', *h)
+
+
+def md4(data: bytes) -> bytes:
+    try:
+        return hashlib.new('md4', data).digest()
+    except ValueError:
+        return _md4_python(data)
+
+
+class ControlFile():
+    def __init__(self, data: bytes):
+        header_data, sep, checksums = data.partition(b'\n\n')
+
+        if not sep:
+            raise ZsyncError('Invalid zsync file')
+
+        self.header = parse_header(header_data)
+
+        try:
+            self.blocksize = int(self.header['Blocksize'])
+            self.length = int(self.header['Length'])
+            seq_matches, rsum_bytes, checksum_bytes = [int(i) for i in self.header.get('Hash-Lengths', '1,4,16').split(',')]
+        except (KeyError, ValueError):
+            raise ZsyncError('Invalid zsync header')
+
+        if self.blocksize <= 0 or (self.blocksize & (self.blocksize - 1)):
+            raise ZsyncError(f'Unsupported block size {self.blocksize}')
+
+        self.sha1 = get_sha1(self.header)
+        self.seq_matches = seq_matches
+        self.checksum_bytes = checksum_bytes
+        self.num_blocks = (self.length + self.blocksize - 1) // self.blocksize
+
+        entry_size = rsum_bytes + checksum_bytes
+        if len(checksums) < self.num_blocks * entry_size:
+            raise ZsyncError('Truncated zsync file')
+
+        # only the last rsum_bytes of the big endian (a, b) pair are stored
+        self.rsum_mask = (1 << (rsum_bytes * 8)) - 1
+        self.rsums: dict[int, list[int]] = {}
+        self.checksums: list[bytes] = []
+
+        for i in range(self.num_blocks):
+            entry = checksums[i * entry_size:(i + 1) * entry_size]
+            self.rsums.setdefault(int.from_bytes(entry[:rsum_bytes], 'big'), []).append(i)
+            self.checksums.append(entry[rsum_bytes:])
+
+
+class ZsyncDownload():
+    """
+        Builds the target file of a control file out of the blocks it
+        shares with a local file (the seed), downloading only the other ranges;
+        the result is verified against the SHA-1 of the control file.
+    """
+
+    def __init__(self, control: ControlFile, url: str, seed_path: str, output_path: str):
+        self.control = control
+        self.url = url
+        self.seed_path = seed_path
+        self.output_path = output_path
+        self.cancelled = False
+        # all the digests of the output, set once it is verified
+        self.digests: Optional[dict[str, str]] = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _check_cancelled(self):
+        if self.cancelled:
+            raise ZsyncCancelledError('Download cancelled')
+
+    def _checksum(self, data) -> bytes:
+        return md4(data)[:self.control.checksum_bytes]
+
+    def _rsum(self, data) -> tuple[int, int]:
+        a = sum(data) & 0xffff
+        b = sum(itertools.accumulate(data)) & 0xffff
+        return a, b
+
+    def _has_rsum(self, data, offset: int, block: int) -> bool:
+        a, b = self._rsum(data[offset:offset + self.control.blocksize])
+        return block in self.control.rsums.get(((a << 16) | b) & self.control.rsum_mask, [])
+
+    def _is_match(self, data, offset: int, block: int) -> bool:
+        c = self.control
+        bs = c.blocksize
+        check_next = c.seq_matches > 1 and (block + 1) < c.num_blocks and (offset + 2 * bs) <= len(data)
+
+        # short checksums are only reliable together with the following block
+        if check_next and not self._has_rsum(data, offset + bs, block + 1):
+            return False
+
+        if self._checksum(data[offset:offset + bs]) != c.checksums[block]:
+            return False
+
+        if check_next:
+            return self._checksum(data[offset + bs:offset + 2 * bs]) == c.checksums[block + 1]
+
+        return True
+
+    def estimate_download_time(self) -> float:
+        """
+            Seconds a full download would take, from the time taken by a small range request
+        """
+        end = min(SPEED_PROBE_SIZE, self.control.length) - 1
+        start_time = time.monotonic()
+        received = 0
+
+        with session.get(self.url, headers={'Range': f'bytes=0-{end}'}, stream=True) as resp:
+            resp.raise_for_status()
+
+            if resp.status_code != 206:
+                raise ZsyncError('The server does not support range requests')
+
+            for chunk in resp.iter_content(64 * 1024):
+                received += len(chunk)
+
+        elapsed = time.monotonic() - start_time
+        return self.control.length * elapsed / max(received, 1)
+
+    def match_seed(self, status_cb: Callable[[float], None], deadline: Optional[float]=None) -> dict[int, int]:
+        """
+            Returns the offset in the seed of every block of the target that was found.
+            The blocks that follow a verified match are compared by their rolling checksum only,
+            MD4 is slow when OpenSSL does not provide it; they are listed in self.unverified.
+            Raises ZsyncError if the scan is still running at deadline, a time.monotonic() value.
+        """
+        c = self.control
+        bs = c.blocksize
+        shift = bs.bit_length() - 1
+        last_full_block = c.length // bs
+        rsums_get = c.rsums.get
+        rsum_mask = c.rsum_mask
+        found: dict[int, int] = {}
+        self.unverified: set[int] = set()
+
+        with open(self.seed_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < bs:
+                return found
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = 0
+                notify_at = 0
+
+                while offset + bs <= size:
+                    a, b = self._rsum(data[offset:offset + bs])
+
+                    while True:
+                        blocks = rsums_get(((a << 16) | b) & rsum_mask)
+
+                        if blocks:
+                            block = next((i for i in blocks if (i not in found) and (i < last_full_block)
+                                          and self._is_match(data, offset, i)), None)
+
+                            if block is not None:
+                                found[block] = offset
+                                offset += bs
+
+                                # unchanged data is usually followed by the next block
+                                while (block + 1) < last_full_block and (offset + bs) <= size \
+                                        and (block + 1) not in found \
+                                        and self._has_rsum(data, offset, block + 1):
+                                    block += 1
+                                    found[block] = offset
+                                    self.unverified.add(block)
+                                    offset += bs
+
+                                break
+
+                        if offset + bs >= size:
+                            offset = size
+                            break
+
+                        old = data[offset]
+                        a = (a + data[offset + bs] - old) & 0xffff
+                        b = (b + a - (old << shift)) & 0xffff
+                        offset += 1
+
+                        if offset >= notify_at:
+                            self._check_cancelled()
+                            status_cb(SCAN_PROGRESS * offset / size)
+                            notify_at = offset + (1024 * 1024)
+
+                            if offset > MATCH_RATIO_CHECK_AFTER and (len(found) * bs) < (offset * MIN_MATCH_RATIO):
+                                raise ZsyncError('The installed version has too little in common with the update')
+
+                            if deadline and time.monotonic() > deadline:
+                                raise ZsyncError('The installed version is scanned slower than the update would be downloaded')
+
+        return found
+
+    def _get_ranges(self, blocks: list[int]) -> list[tuple[int, int]]:
+        c = self.control
+        ranges = []
+
+        for block in sorted(blocks):
+            start = block * c.blocksize
+            end = min(start + c.blocksize, c.length)
+
+            if ranges and (start - ranges[-1][1]) <= RANGE_MERGE_GAP:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+
+        return ranges
+
+    def _fetch_ranges(self, ranges: list[tuple[int, int]], out, status_cb: Callable[[float], None]):
+        total = sum([end - start for start, end in ranges])
+        downloaded = 0
+        url = self.url
+
+        for start, end in ranges:
+            self._check_cancelled()
+
+            with session.get(url, headers={'Range': f'bytes={start}-{end - 1}'}, stream=True) as resp:
+                resp.raise_for_status()
+
+                if resp.status_code != 206:
+                    raise ZsyncError('The server does not support range requests')
+
+                # redirects are followed once, signed download links stay valid for a while
+                url = resp.url
+                out.seek(start)
+
+                for chunk in resp.iter_content(64 * 1024):
+                    self._check_cancelled()
+                    out.write(chunk)
+                    downloaded += len(chunk)
+                    status_cb(SCAN_PROGRESS + (1 - SCAN_PROGRESS) * downloaded / total)
+
+                if out.tell() != end:
+                    raise ZsyncError(f'Unexpected response length for range {start}-{end}')
+
+    def _find_wrong_blocks(self, out) -> list[int]:
+        """
+            Returns the blocks matched by their rolling checksum only whose content is wrong
+        """
+        c = self.control
+        wrong = []
+
+        for block in sorted(self.unverified):
+            self._check_cancelled()
+            out.seek(block * c.blocksize)
+
+            if self._checksum(out.read(c.blocksize)) != c.checksums[block]:
+                wrong.append(block)
+
+        return wrong
+
+    def _has_valid_sha1(self) -> bool:
+        # the other digests are computed in the same read, so that the file is not hashed again later
+        digests = compute_file_digests(self.output_path)
+
+        if digests['sha1'] != self.control.sha1:
+            return False
+
+        self.digests = digests
+        return True
+
+    def run(self, status_cb: Callable[[float], None]) -> int:
+        """
+            Returns the number of bytes downloaded
+        """
+        c = self.control
+
+        if not c.sha1:
+            raise ZsyncError('The zsync file has no SHA-1 checksum')
+
+        max_scan_time = self.estimate_download_time() * MAX_SCAN_TIME_RATIO
+        deadline = time.monotonic() + max_scan_time
+        found = self.match_seed(status_cb, deadline=deadline)
+        ranges = self._get_ranges([block for block in range(c.num_blocks) if block not in found])
+        downloaded = sum([end - start for start, end in ranges])
+
+        logging.info(f'zsync: {len(found)}/{c.num_blocks} blocks found locally, downloading {downloaded} bytes in {len(ranges)} requests')
+
+        with open(self.seed_path, 'rb') as seed, open(self.output_path, 'wb') as out:
+            out.truncate(c.length)
+
+            for block, offset in sorted(found.items()):
+                seed.seek(offset)
+                out.seek(block * c.blocksize)
+                out.write(seed.read(c.blocksize))
+
+            self._fetch_ranges(ranges, out, status_cb)
+
+        if self._has_valid_sha1():
+            return downloaded
+
+        # only the blocks that were not verified with MD4 can be wrong
+        logging.warning('zsync: SHA-1 mismatch, verifying the blocks found by their rolling checksum')
+
+        with open(self.output_path, 'r+b') as out:
+            ranges = self._get_ranges(self._find_wrong_blocks(out))
+            self._fetch_ranges(ranges, out, status_cb)
+
+        downloaded += sum([end - start for start, end in ranges])
+
+        if ranges and self._has_valid_sha1():
+            return downloaded
+
+        raise ZsyncError('SHA-1 mismatch after zsync')
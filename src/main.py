@@ -152,10 +152,11 @@ class GearleverApplication(Adw.Application):
         if self.win:
             tutorial.present(self.win)
 
+@Config.transaction()
 def migrate_to_v2_config():
     bg_update_k = 'fetch-updates-in-background'
     settings_conf = json_config.read_json_config('settings')
-    Config.parser[Config.parser.default_section][bg_update_k] = Config.return_boolean(settings_conf.get(bg_update_k, False))
+    Config.set_default(bg_update_k, Config.return_boolean(settings_conf.get(bg_update_k, False)))
     installed_apps = appimage_provider.list_installed()
 
     for app in installed_apps:
@@ -1,5 +1,4 @@
 import logging
-import requests
 import os
 from fnmatch import fnmatch
 from typing import Optional
@@ -8,6 +7,7 @@ from gi.repository import Adw
 
 from ..lib import json_config
 from ..lib.ini_config import Config
+from .Models import ResolvedUpdate
 from .UpdateManager import UpdateManager
 from .StaticFileUpdater import StaticFileUpdater
 from ..components.AdwEntryRowDefault import AdwEntryRowDefault
@@ -28,6 +28,9 @@ class CodebergUpdater(UpdateManager):
         self.repo_filename_row = None
         self.allow_prereleases_row = None
 
+    def get_source_host(self):
+        return 'codeberg.org'
+
     def get_url_data(self, url: str):
         if url.startswith('https://'):
             logging.debug(f'CodebergUpdater: found http url, trying to detect codeberg data')
@@ -69,21 +72,18 @@ class CodebergUpdater(UpdateManager):
             Config.set_app_update_config(self.el, self, config)
 
     def download(self, status_update_cb) -> tuple[str, str]:
-        target_asset = self.fetch_target_asset()
-        if not target_asset:
+        resolved = self.get_resolved_update() or self.resolve()
+        if not resolved:
             raise Exception(f'Missing target_asset for {self.name} instance')
 
-        dwnl = target_asset['browser_download_url']
-        self.staticfile_manager = StaticFileUpdater(self.el, dwnl)
-        fname, etag = self.staticfile_manager.download(status_update_cb)
+        self.staticfile_manager = StaticFileUpdater(self.el)
+        fname, etag = self.staticfile_manager.download_file(resolved, status_update_cb)
 
-        self.staticfile_manager = None
-        return fname, target_asset['id']
+        return fname, resolved.asset_id
 
     def cancel_download(self):
         if self.staticfile_manager:
             self.staticfile_manager.cancel_download()
-            self.staticfile_manager = None
 
     def cleanup(self):
         if self.staticfile_manager:
@@ -111,9 +111,7 @@ class CodebergUpdater(UpdateManager):
             rel_url += '?pre-release=exclude&draft=exclude'
 
         try:
-            rel_data_resp = requests.get(rel_url)
-            rel_data_resp.raise_for_status()
-            rel_data = rel_data_resp.json()
+            rel_data = self.fetch_json(('codeberg', 'codeberg.org', '/'.join(url_data[:2]), allow_prereleases), rel_url)
         except Exception as e:
             logging.error(e)
             return
@@ -153,13 +151,26 @@ class CodebergUpdater(UpdateManager):
         logging.debug(f'Found 1 matching asset: {download_asset["browser_download_url"]}')
         return download_asset
 
-    def is_update_available(self):
-        config = self.get_config()
+    def resolve(self):
         target_asset = self.fetch_target_asset()
+        self.resolved = None
 
         if target_asset:
+            self.resolved = ResolvedUpdate(
+                target_asset['browser_download_url'],
+                size=target_asset['size'],
+                asset_id=target_asset['id'],
+            )
+
+        return self.resolved
+
+    def is_update_available(self):
+        config = self.get_config()
+        resolved = self.resolve()
+
+        if resolved:
             old_size = os.path.getsize(self.el.file_path)
-            is_size_different = target_asset['size'] != old_size
+            is_size_different = resolved.size != old_size
             return is_size_different
 
         if config.get('repo_filename'):
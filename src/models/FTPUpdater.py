@@ -1,21 +1,31 @@
 import logging
 import os
 import ftputil
+import ftputil.error
+import threading
 from ftputil.file import FTPFile
 from ftputil import FTPHost
 import fnmatch
-import shutil
 from typing import Optional
 from urllib.parse import urlsplit
-from ..lib.utils import get_random_string, get_file_hash
+from ..lib.utils import get_random_string, store_file_digests
+from ..lib import partial_downloads
+from ..lib import download_engine
 from ..lib import json_config
 from ..lib.ini_config import Config
 
-from .Models import DownloadInterruptedException
+from .Models import DownloadInterruptedException, ResolvedUpdate
 from .UpdateManager import UpdateManager
 from .StaticFileUpdater import StaticFileUpdater
 from ..components.AdwEntryRowDefault import AdwEntryRowDefault
 
+# errors after which a download is resumed
+TRANSIENT_ERRORS = (
+    ftputil.error.FTPOSError,
+    ftputil.error.TemporaryError,
+    partial_downloads.IncompleteDownloadError,
+)
+
 
 # Example:
 # https://download.kde.org/stable/digikam/
@@ -33,6 +43,12 @@ class FTPUpdater(UpdateManager):
         self.url_row = None
         self.filename_row = None
         self.current_download: FTPHost | None = None
+        self.cancelled = threading.Event()
+        self.staged_files: list[str] = []
+
+    def get_source_host(self):
+        server = self.get_config().get('url', '').replace('ftp://', '')
+        return server.split('/')[0] or None
 
     def migrate_v2(self):
         app_config = json_config.read_config_for_app(self.el)
@@ -54,8 +70,8 @@ class FTPUpdater(UpdateManager):
         if not conf:
             raise Exception('Missing url data for FTPUpdater')
 
-        target_asset = self.fetch_target_asset()
-        if not target_asset:
+        resolved = self.get_resolved_update() or self.resolve()
+        if not resolved:
             raise Exception('Missing target asset for FTPUpdater')
 
         random_name = get_random_string()
@@ -66,42 +82,75 @@ class FTPUpdater(UpdateManager):
         fname = f'{self.download_folder}/{random_name}.appimage'
 
         server = conf['url'].replace('ftp://', '')
+        self.staged_files.append(fname)
+        part_path = partial_downloads.prepare(self.download_folder, f'ftp://{server}{resolved.url}', str(resolved.size))
+        self.cancelled.clear()
+        attempt = 0
 
-        self.current_download = ftputil.FTPHost(server, 'anonymous', '')
-        chunk_size = 8192
-        downloaded = 0
-        oldperc = 0
+        while True:
+            try:
+                digests = self._download_part(server, resolved, part_path, status_update_cb)
+                break
+            except Exception as e:
+                if self.cancelled.is_set():
+                    raise DownloadInterruptedException()
 
-        try:
-            remote = self.current_download.open(target_asset['item_path'], 'rb')
-            with open(fname, 'wb') as local:
-                while True:
-                    chunk = remote.read(chunk_size)
+                if isinstance(e, download_engine.InvalidDownloadError):
+                    partial_downloads.discard(part_path)
 
-                    if not chunk:
-                        break
+                if not isinstance(e, TRANSIENT_ERRORS):
+                    raise e
 
-                    local.write(chunk)
-                    downloaded += len(chunk)
-                    
-                    # Calculate and display percentage
-                    percent = (downloaded / target_asset['size'])
-                    roundedperc = round(percent * 100)
-                    if roundedperc != oldperc:
-                        status_update_cb(percent)
-                        oldperc = roundedperc
+                if not partial_downloads.wait_before_retry(attempt, e, self.cancelled):
+                    if self.cancelled.is_set():
+                        raise DownloadInterruptedException()
 
-        except Exception as e:
-            raise DownloadInterruptedException
+                    raise e
 
-        if self.current_download:
-            self.current_download.close()
-            self.current_download = None
+                attempt += 1
+            finally:
+                self._close_connection()
+
+        partial_downloads.complete(part_path, fname)
+        store_file_digests(fname, digests)
+
+        return fname, digests['md5']
+
+    def _download_part(self, server: str, resolved: ResolvedUpdate, part_path: str, status_update_cb) -> dict[str, str]:
+        offset = partial_downloads.get_offset(part_path)
 
-        file_hash = get_file_hash(None, 'md5', file_path=fname)
-        return fname, file_hash
+        if offset > resolved.size:
+            partial_downloads.discard(part_path)
+            offset = 0
+
+        verifier = download_engine.DownloadVerifier()
+        if offset:
+            verifier.update_from_file(part_path, offset)
+
+        partial_downloads.check_free_space(self.download_folder, resolved.size - offset)
+        self.current_download = ftputil.FTPHost(server, 'anonymous', '')
+
+        # REST makes the server start the transfer from the given byte
+        with self.current_download.open(resolved.url, 'rb', rest=(offset or None)) as remote:
+            with partial_downloads.open_part(part_path, offset, resolved.size) as local:
+                download_engine.copy_stream(
+                    download_engine.get_reader(remote), local, offset, resolved.size,
+                    download_engine.ProgressThrottle(status_update_cb),
+                    verifier
+                )
+
+        received = partial_downloads.get_offset(part_path)
+        if received < resolved.size:
+            raise partial_downloads.IncompleteDownloadError(f'Received {received} of {resolved.size} bytes')
+
+        verifier.verify()
+        return verifier.get_digests()
 
     def cancel_download(self):
+        self.cancelled.set()
+        self._close_connection()
+
+    def _close_connection(self):
         if self.current_download:
             try:
                 self.current_download.close()
@@ -111,15 +160,22 @@ class FTPUpdater(UpdateManager):
                 self.current_download = None
 
     def cleanup(self):
-        if os.path.exists(self.download_folder):
-            shutil.rmtree(self.download_folder)
+        # partial downloads are kept in the same folder, to be resumed
+        for path in self.staged_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.staged_files = []
 
     def fetch_target_asset(self):
         conf = self.get_config()
-        pattern = conf['filename']
+        server = conf['url'].replace('ftp://', '')
+
+        return self.fetch_once(('ftp', server, conf['filename']), self._find_target_asset, server, conf['filename'])
+
+    def _find_target_asset(self, server: str, pattern: str):
         matching_file = None
 
-        server = conf['url'].replace('ftp://', '')
         with ftputil.FTPHost(server, 'anonymous', '') as ftp_host:
             # Parse the pattern to separate directory path from filename pattern
             parts = pattern.split('/')
@@ -155,7 +211,7 @@ class FTPUpdater(UpdateManager):
                 current_pattern = remaining_parts[0]
                 
                 try:
-                    items = ftp_host.listdir(current_path)
+                    items = self.fetch_once(('ftp-listing', server, current_path), ftp_host.listdir, current_path)
                 except:
                     return
                 
@@ -191,14 +247,24 @@ class FTPUpdater(UpdateManager):
         logging.debug(f'Found 1 matching asset: {matching_file["item_path"]}')
         return matching_file
 
-    def is_update_available(self):
+    def resolve(self):
         target_asset = self.fetch_target_asset()
+        self.resolved = None
+
+        if target_asset:
+            # the path of the file on the server
+            self.resolved = ResolvedUpdate(target_asset['item_path'], size=target_asset['size'])
+
+        return self.resolved
+
+    def is_update_available(self):
+        resolved = self.resolve()
 
-        if not target_asset:
+        if not resolved:
             return False
 
         old_size = os.path.getsize(self.el.file_path)
-        is_size_different = target_asset['size'] != old_size
+        is_size_different = resolved.size != old_size
         return is_size_different
 
     def load_form_rows(self, embedded=None):
@@ -1,22 +1,66 @@
 import logging
-import requests
 import os
 import re
+import time
 import fnmatch
+import threading
 from typing import Optional, Literal
 from gi.repository import Adw, Gio
 from urllib.parse import urlsplit
 
 from ..lib.utils import get_file_hash
 from ..lib import json_config
+from ..lib import zsync
+from ..lib.http_cache import http_cache
 from ..lib.ini_config import Config
 from ..providers.AppImageProvider import AppImageProvider, AppImageListElement
-from .Models import DownloadInterruptedException
+from .Models import DownloadInterruptedException, RateLimitedException, ResolvedUpdate
 
 from .UpdateManager import UpdateManager
 from .StaticFileUpdater import StaticFileUpdater
 from ..components.AdwEntryRowDefault import AdwEntryRowDefault
 
+TOKEN_ENV_VARS = ['GEARLEVER_GITHUB_TOKEN', 'GITHUB_TOKEN']
+
+
+class GithubRateLimit():
+    """
+        Tracks the API budget reported by the X-RateLimit headers.
+        Requests in flight reserve a unit of the budget, so that once it
+        is spent the following checks are deferred without contacting the API.
+    """
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.reset_time: float = 0
+        self.reserved = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.remaining is not None and time.time() >= self.reset_time:
+                self.remaining = None
+
+            if self.remaining is not None and (self.remaining - self.reserved) <= 0:
+                raise RateLimitedException(self.reset_time)
+
+            self.reserved += 1
+
+    def release(self, headers=None):
+        with self._lock:
+            self.reserved -= 1
+
+            if headers and ('x-ratelimit-remaining' in headers):
+                try:
+                    self.remaining = int(headers['x-ratelimit-remaining'])
+                    self.reset_time = float(headers.get('x-ratelimit-reset', 0))
+                except ValueError:
+                    pass
+
+
+rate_limit = GithubRateLimit()
+
+
 class GithubUpdater(UpdateManager):
     handles_embedded = 'gh-releases-zsync|'
     staticfile_manager: Optional[StaticFileUpdater]
@@ -121,6 +165,46 @@ class GithubUpdater(UpdateManager):
             'tag_name': tag_name
         }
 
+    def get_source_host(self):
+        return 'api.github.com'
+
+    @staticmethod
+    def get_token() -> Optional[str]:
+        """
+            An optional personal access token, which raises the API rate limit
+        """
+        for k in TOKEN_ENV_VARS:
+            if os.environ.get(k):
+                return os.environ[k]
+
+        return Config.get_default('github_token') or None
+
+    def fetch_releases(self, rel_url: str):
+        headers = {}
+        token = GithubUpdater.get_token()
+
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        rate_limit.acquire()
+        resp = None
+
+        try:
+            resp = http_cache.get(rel_url, headers=headers)
+        finally:
+            rate_limit.release(resp.headers if resp is not None else None)
+
+        if resp.status_code in [403, 429]:
+            if resp.headers.get('x-ratelimit-remaining') == '0':
+                raise RateLimitedException(float(resp.headers.get('x-ratelimit-reset', time.time() + 60)))
+
+            retry_after = resp.headers.get('retry-after', '')
+            if retry_after.isdigit():
+                raise RateLimitedException(time.time() + int(retry_after))
+
+        resp.raise_for_status()
+        return resp.json()
+
     def does_allow_prereleases(self):
         allow_prereleases = False
 
@@ -134,21 +218,19 @@ class GithubUpdater(UpdateManager):
         return allow_prereleases
 
     def download(self, status_update_cb) -> tuple[str, str]:
-        target_asset = self.fetch_target_asset()
-        if not target_asset:
+        resolved = self.get_resolved_update() or self.resolve()
+        if not resolved:
             raise Exception(f'Missing target_asset for {self.name} instance')
 
-        dwnl = target_asset['asset']['browser_download_url']
-        self.staticfile_manager = StaticFileUpdater(self.el, dwnl)
-        fname, etag = self.staticfile_manager.download(status_update_cb)
+        self.staticfile_manager = StaticFileUpdater(self.el)
+        fname, etag = self.staticfile_manager.download_delta(resolved, status_update_cb) or \
+            self.staticfile_manager.download_file(resolved, status_update_cb)
 
-        self.staticfile_manager = None
-        return fname, target_asset['asset']['id']
+        return fname, resolved.asset_id
 
     def cancel_download(self):
         if self.staticfile_manager:
             self.staticfile_manager.cancel_download()
-            self.staticfile_manager = None
 
     def cleanup(self):
         if self.staticfile_manager:
@@ -190,15 +272,17 @@ class GithubUpdater(UpdateManager):
             rel_url += f'/latest'
 
         try:
-            rel_data_resp = requests.get(rel_url)
-            rel_data_resp.raise_for_status()
-            rel_data = rel_data_resp.json()
+            rel_data = self.fetch_once(
+                ('github', 'api.github.com', f'{update_data["username"]}/{update_data["repo"]}', allow_prereleases),
+                self.fetch_releases,
+                rel_url
+            )
             if not allow_prereleases:
                 rel_data = [rel_data]
+        except RateLimitedException as e:
+            logging.warning(e)
+            raise e
         except Exception as e:
-            if 'rate limit exceeded' in str(e):
-                print(str(e))
-
             logging.error(e)
             return
 
@@ -258,35 +342,58 @@ class GithubUpdater(UpdateManager):
 
                 return {'asset': asset, 'zsync': None}
 
+    def resolve(self):
+        target_asset = self.fetch_target_asset()
+
+        if not target_asset:
+            self.resolved = None
+            return None
+
+        asset = target_asset['asset']
+        zsync_url = None
+        zsync_header = None
+
+        if target_asset['zsync']:
+            zsync_url = target_asset['zsync']['browser_download_url']
+            logging.debug('GithubUpdated: checking zsync file at ' + zsync_url)
+            zsync_header = self.fetch_zsync_header(zsync_url)
+
+        self.resolved = ResolvedUpdate(
+            asset['browser_download_url'],
+            size=asset['size'],
+            digest=asset.get('digest') or None,
+            asset_id=asset['id'],
+            zsync_url=zsync_url,
+            zsync_header=zsync_header,
+        )
+
+        return self.resolved
+
     def is_update_available(self):
         if not self.el:
             return False
 
-        target_asset = self.fetch_target_asset()
+        resolved = self.resolve()
 
         if not os.path.exists(self.el.file_path):
             return False
 
-        if target_asset:
-            if target_asset['zsync']:
-                logging.debug('GithubUpdated: checking zsync file at ' + target_asset['zsync']['browser_download_url'])
-                zsync_file = requests.get(target_asset['zsync']['browser_download_url']).text
-                zsync_file_header = zsync_file.split('\n\n', 1)[0]
-                sha_pattern = r"SHA-1:\s*([0-9a-f]{40})"
-                curr_version_hash = get_file_hash(Gio.File.new_for_path(self.el.file_path), alg='sha1')
+        if resolved:
+            if resolved.zsync_header is not None:
+                sha1 = zsync.get_sha1(resolved.zsync_header)
 
-                match = re.search(sha_pattern, zsync_file_header)
-                if match:
-                    return match.group(1) != curr_version_hash
+                if sha1:
+                    curr_version_hash = get_file_hash(Gio.File.new_for_path(self.el.file_path), alg='sha1')
+                    return sha1 != curr_version_hash
 
             else:
-                digest = target_asset['asset'].get('digest', '')
-                if digest and digest.startswith('sha256:'):
+                digest = resolved.digest or ''
+                if digest.startswith('sha256:'):
                     curr_version_hash = get_file_hash(Gio.File.new_for_path(self.el.file_path), alg='sha256')
                     return f'sha256:{curr_version_hash}' != digest
 
                 old_size = os.path.getsize(self.el.file_path)
-                is_size_different = target_asset['asset']['size'] != old_size
+                is_size_different = resolved.size != old_size
                 return is_size_different
 
         config = self.get_config()
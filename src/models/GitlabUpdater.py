@@ -1,5 +1,4 @@
 import logging
-import requests
 import os
 import re
 from fnmatch import fnmatch
@@ -7,7 +6,9 @@ from typing import Optional
 from urllib.parse import urlsplit, quote, urlencode
 
 from ..lib import json_config
+from ..lib.http_session import session
 from ..lib.ini_config import Config
+from .Models import ResolvedUpdate
 from .UpdateManager import UpdateManager
 from .StaticFileUpdater import StaticFileUpdater
 from ..components.AdwEntryRowDefault import AdwEntryRowDefault
@@ -45,6 +46,9 @@ class GitlabUpdater(UpdateManager):
             'repo': '/'.join(paths[1:4])
         }
 
+    def get_source_host(self):
+        return urlsplit(self.get_config().get('repo_url', '')).netloc or None
+
     def migrate_v2(self):
         app_config = json_config.read_config_for_app(self.el)
         config = None
@@ -67,21 +71,18 @@ class GitlabUpdater(UpdateManager):
             Config.set_app_update_config(self.el, self, config)
 
     def download(self, status_update_cb) -> tuple[str, str]:
-        target_asset = self.fetch_target_asset()
-        if not target_asset:
+        resolved = self.get_resolved_update() or self.resolve()
+        if not resolved:
             raise Exception(f'Missing target_asset for {self.name} instance')
 
-        dwnl = target_asset['direct_asset_url']
-        self.staticfile_manager = StaticFileUpdater(self.el, dwnl)
-        fname, etag = self.staticfile_manager.download(status_update_cb)
+        self.staticfile_manager = StaticFileUpdater(self.el)
+        fname, etag = self.staticfile_manager.download_file(resolved, status_update_cb)
 
-        self.staticfile_manager = None
-        return fname, target_asset['id']
+        return fname, resolved.asset_id
 
     def cancel_download(self):
         if self.staticfile_manager:
             self.staticfile_manager.cancel_download()
-            self.staticfile_manager = None
 
     def cleanup(self):
         if self.staticfile_manager:
@@ -102,9 +103,7 @@ class GitlabUpdater(UpdateManager):
         ])
 
         try:
-            rel_data_resp = requests.get(rel_url)
-            rel_data_resp.raise_for_status()
-            rel_data = rel_data_resp.json()
+            rel_data = self.fetch_json(('gitlab', url_data['netloc'], url_data['repo'], False), rel_url)
         except Exception as e:
             logging.error(e)
             return
@@ -145,19 +144,33 @@ class GitlabUpdater(UpdateManager):
         logging.debug(f'Found 1 matching asset: {download_asset["direct_asset_url"]}')
         return download_asset
 
-    def is_update_available(self):
+    def resolve(self):
         target_asset = self.fetch_target_asset()
+        self.resolved = None
 
         if target_asset:
-            asset_head_req = requests.head(target_asset['direct_asset_url'])
+            asset_url = target_asset['direct_asset_url']
+            asset_headers = self.fetch_once(('head', asset_url), lambda: session.head(asset_url).headers)
+            asset_size = asset_headers.get('content-length', None)
+
+            self.resolved = ResolvedUpdate(
+                asset_url,
+                size=int(asset_size) if asset_size else None,
+                etag=asset_headers.get('etag', None),
+                asset_id=target_asset['id'],
+            )
+
+        return self.resolved
+
+    def is_update_available(self):
+        resolved = self.resolve()
 
+        if resolved:
             is_size_different = False
             old_size = os.path.getsize(self.el.file_path)
-            asset_size = asset_head_req.headers.get('content-length', None)
 
-            if asset_size:
-                asset_size = int(asset_size)
-                is_size_different = asset_size != old_size
+            if resolved.size:
+                is_size_different = resolved.size != old_size
 
             return is_size_different
 
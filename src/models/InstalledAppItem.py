@@ -0,0 +1,19 @@
+from gi.repository import GObject
+
+
+class InstalledAppItem(GObject.Object):
+    """
+        A compact item of the installed apps list model;
+        widgets are created only for the items that are visible
+    """
+    __gtype_name__ = 'InstalledAppItem'
+
+    sort_key = GObject.Property(type=str, default='')
+    updatable = GObject.Property(type=bool, default=False)
+
+    def __init__(self, app, signature: tuple):
+        super().__init__(sort_key=app.name.lower())
+
+        self.app = app
+        self.signature = signature
+        self.search_key = app.name.lower()
@@ -1,6 +1,8 @@
+import time
 import logging
 
 from .AppListElement import AppListElement
+from ..lib import zsync
 from typing import Optional
 
 class AppUpdateElement():
@@ -13,6 +15,59 @@ class AppUpdateElement():
         for k, v in kwargs.items():
             self.extra_data[k] = v
 
+class ResolvedUpdate():
+    """
+        The release file found by an update check
+    """
+    def __init__(self, url: str, size: Optional[int]=None, digest: Optional[str]=None, etag: Optional[str]=None,
+                 asset_id=None, zsync_url: Optional[str]=None, zsync_header: Optional[dict]=None):
+        self.url = url
+        self.size = size
+        # in the form <algorithm>:<hex digest>
+        self.digest = digest
+        self.etag = etag
+        self.asset_id = asset_id
+        self.zsync_url = zsync_url
+        self.zsync_header = zsync_header
+        self.resolved_at = time.time()
+
+    def is_fresh(self, ttl: int) -> bool:
+        return (time.time() - self.resolved_at) < ttl
+
+    def get_expected_digests(self) -> dict[str, str]:
+        """
+            The digests published for the release file, by algorithm
+        """
+        digests = {}
+
+        if self.digest and ':' in self.digest:
+            alg, value = self.digest.split(':', 1)
+            digests[alg.lower()] = value.lower()
+
+        if self.zsync_header:
+            sha1 = zsync.get_sha1(self.zsync_header)
+
+            if sha1:
+                digests['sha1'] = sha1
+
+        return digests
+
+class UpdateCheckResult():
+    def __init__(self, el, manager, available: 'bool | None'=None, error: Optional[Exception]=None,
+                 timed_out=False, deferred_until: Optional[float]=None):
+        self.el = el
+        self.manager = manager
+        self.available: 'bool | None' = available
+        self.error: Optional[Exception] = error
+        self.timed_out: bool = timed_out
+        # the check was not made because the source is rate limited until this timestamp
+        self.deferred_until: Optional[float] = deferred_until
+        self.resolved: Optional[ResolvedUpdate] = manager.resolved if manager else None
+
+    @property
+    def deferred(self) -> bool:
+        return self.deferred_until is not None
+
 class InternalError(Exception):
     def __init__(self, message: str, *args) -> None:
         super().__init__(*args)
@@ -20,5 +75,10 @@ class InternalError(Exception):
 
         logging.error(message)
 
+class RateLimitedException(Exception):
+    def __init__(self, reset_time: float) -> None:
+        super().__init__(f'API rate limit exceeded, retry after {time.strftime("%H:%M", time.localtime(reset_time))}')
+        self.reset_time = reset_time
+
 class DownloadInterruptedException(Exception):
     pass
\ No newline at end of file
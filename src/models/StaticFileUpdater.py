@@ -1,27 +1,43 @@
+import re
 import logging
 import requests
-import shutil
+import urllib3
+import threading
 import os
-import posixpath
 from  urllib.parse import urlparse
-import re
 from gi.repository import Adw, Gio
 from typing import Optional, Literal
 
-from ..lib.utils import get_random_string, url_is_valid, get_file_hash
+from ..lib.utils import get_random_string, url_is_valid, get_file_hash, store_file_digests
 from ..lib import json_config
+from ..lib import zsync
+from ..lib import partial_downloads
+from ..lib import download_engine
+from ..lib.http_session import session
+from ..lib.http_cache import http_cache
 from ..lib.ini_config import Config
 from ..providers.AppImageProvider import AppImageProvider, AppImageListElement
-from .Models import DownloadInterruptedException
+from .Models import DownloadInterruptedException, ResolvedUpdate
 from ..components.AdwEntryRowDefault import AdwEntryRowDefault
 
 from .UpdateManager import UpdateManager
 
+# errors after which a download is resumed
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+    partial_downloads.IncompleteDownloadError,
+)
+
 class StaticFileUpdater(UpdateManager):
     label = _('Static URL')
     handles_embedded = 'zsync|'
     name = 'StaticFileUpdater'
     current_download: Optional[requests.Response]
+    current_delta: Optional[zsync.ZsyncDownload]
 
     @staticmethod
     def get_url_headers(url):
@@ -29,7 +45,7 @@ class StaticFileUpdater(UpdateManager):
         head_request_error = False
 
         try:
-            resp = requests.head(url, allow_redirects=True)
+            resp = session.head(url, allow_redirects=True)
             resp.raise_for_status()
             headers = resp.headers
         except Exception as e:
@@ -41,7 +57,7 @@ class StaticFileUpdater(UpdateManager):
             logging.warn('Head request failed, trying with stream mode...')
 
             try:
-                resp = requests.get(url, allow_redirects=True, stream=True)
+                resp = session.get(url, allow_redirects=True, stream=True)
                 with resp as r:
                     r.raise_for_status()
                     headers = r.headers
@@ -56,77 +72,197 @@ class StaticFileUpdater(UpdateManager):
         super().__init__(embedded=embedded, el=el)
         self.form_row = None
         self.current_download = None
+        self.current_delta = None
+        self.cancelled = threading.Event()
+        self.staged_files: list[str] = []
 
     def download(self, status_update_cb) -> tuple[str, str]:
+        resolved = self.get_resolved_update() or self.resolve()
+
+        if not resolved:
+            raise Exception('Missing download URL')
+
+        return self.download_delta(resolved, status_update_cb) or \
+            self.download_file(resolved, status_update_cb)
+
+    def download_delta(self, resolved: ResolvedUpdate, status_update_cb) -> Optional[tuple[str, str]]:
+        """
+            Builds the update from the blocks it shares with the installed AppImage
+            and downloads only the others; returns None if a full download is needed
+        """
+        if not (resolved.zsync_url and self.el and self.el.file_path and os.path.isfile(self.el.file_path)):
+            return None
+
         random_name = get_random_string()
         fname = f'{self.download_folder}/{random_name}.appimage'
 
         if not os.path.exists(self.download_folder):
             os.makedirs(self.download_folder)
 
-        dwnl_url = self.get_config().get('url')
-        edwnl_url = self.get_embedded_url()
-
-        if edwnl_url:
-            zsync_file = requests.get(edwnl_url).text
-            zsync_file_header = zsync_file.split('\n\n', 1)[0]
-            url_pattern = r"URL:\s(.*)"
-            match = re.search(url_pattern, zsync_file_header)
-
-            if match:
-                zsyncfile_url = match.group(1)
-
-                if zsyncfile_url.startswith('https://') or \
-                    zsyncfile_url.startswith('http://'):
-                    dwnl_url = zsyncfile_url
-                else:
-                    urlparsed = urlparse(edwnl_url)
-                    pp = posixpath.join(posixpath.dirname(urlparsed.path), zsyncfile_url)
-                    dwnl_url = urlparsed._replace(path=pp,query='',fragment='').geturl()
-            else:
-                dwnl_url = re.sub(r"\.zsync$", "", edwnl_url)
-
-        if not dwnl_url:
-            raise Exception('Missing download URL')
+        self.staged_files.append(fname)
 
-        self.current_download = requests.get(dwnl_url, stream=True)
-        etag = self.current_download.headers.get("etag", '')
-        total_size = int(self.current_download.headers.get("content-length", 0))
-        status = 0
-        block_size = 1024
+        try:
+            control_resp = http_cache.get(resolved.zsync_url)
+            control_resp.raise_for_status()
+            control = zsync.ControlFile(control_resp.content)
+            partial_downloads.check_free_space(self.download_folder, control.length)
+
+            delta = zsync.ZsyncDownload(control, resolved.url, self.el.file_path, fname)
+            self.current_delta = delta
+            downloaded = delta.run(status_update_cb)
+        except zsync.ZsyncCancelledError:
+            raise DownloadInterruptedException()
+        except Exception as e:
+            logging.warning(f'Delta update failed, downloading the whole file: {e}')
 
-        if os.path.exists(fname):
-            os.remove(fname)
+            if os.path.exists(fname):
+                os.remove(fname)
 
-        d_notify_at = 0.1
-        with open(fname, 'wb') as f:
-            for chunk in self.current_download.iter_content(block_size):
-                f.write(chunk)
+            return None
+        finally:
+            self.current_delta = None
 
-                status += block_size
+        logging.info(f'Delta update downloaded {downloaded} of {control.length} bytes')
+        store_file_digests(fname, delta.digests)
 
-                if total_size:
-                    d_perc = (status / total_size)
+        return fname, control.sha1
 
-                    if d_perc > d_notify_at:
-                        d_notify_at += 0.01
-                        # logging.info(f'Download status {d_perc * 100}')
-                        status_update_cb(status / total_size)
+    def download_file(self, resolved: ResolvedUpdate, status_update_cb) -> tuple[str, str]:
+        """
+            Downloads the release file, resuming the partial file left by an
+            interrupted attempt; dropped connections are retried with a backoff
+        """
+        random_name = get_random_string()
+        fname = f'{self.download_folder}/{random_name}.appimage'
 
-        if os.path.getsize(fname) < total_size:
-            raise DownloadInterruptedException()
+        if not os.path.exists(self.download_folder):
+            os.makedirs(self.download_folder)
+
+        self.staged_files.append(fname)
+
+        validator = resolved.etag or (str(resolved.size) if resolved.size else None)
+        part_path = partial_downloads.prepare(self.download_folder, resolved.url, validator)
+        self.cancelled.clear()
+        attempt = 0
+
+        while True:
+            try:
+                etag, digests = self._download_part(resolved, part_path, status_update_cb)
+                break
+            except Exception as e:
+                if self.cancelled.is_set():
+                    raise DownloadInterruptedException()
+
+                if isinstance(e, download_engine.InvalidDownloadError):
+                    partial_downloads.discard(part_path)
+
+                if not isinstance(e, TRANSIENT_ERRORS):
+                    raise e
+
+                if not partial_downloads.wait_before_retry(attempt, e, self.cancelled):
+                    if self.cancelled.is_set():
+                        raise DownloadInterruptedException()
+
+                    raise e
+
+                attempt += 1
+            finally:
+                self.current_download = None
+
+        partial_downloads.complete(part_path, fname)
+        store_file_digests(fname, digests)
 
-        self.current_download = None
         return fname, etag
 
+    def _download_part(self, resolved: ResolvedUpdate, part_path: str, status_update_cb) -> tuple[str, dict[str, str]]:
+        offset = partial_downloads.get_offset(part_path)
+        headers = {}
+
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            if_range = partial_downloads.get_if_range(part_path)
+
+            if if_range:
+                headers['If-Range'] = if_range
+
+        self.current_download = session.get(resolved.url, stream=True, headers=headers)
+
+        with self.current_download as resp:
+            if resp.status_code == 416:
+                partial_downloads.discard(part_path)
+                raise partial_downloads.IncompleteDownloadError('The partial download cannot be resumed')
+
+            resp.raise_for_status()
+
+            # compressed responses are decoded, their length and ranges do not match the file
+            encoded = resp.headers.get('content-encoding', 'identity').lower() != 'identity'
+
+            if encoded and resp.status_code == 206:
+                partial_downloads.discard(part_path)
+                raise partial_downloads.IncompleteDownloadError('A compressed partial download cannot be resumed')
+
+            content_range = re.match(r'bytes (\d+)-', resp.headers.get('content-range', ''))
+            if encoded or not (resp.status_code == 206 and content_range and int(content_range.group(1)) == offset):
+                # the server sent the whole file
+                offset = 0
+
+            etag = resp.headers.get('etag', '')
+            if not offset:
+                # weak ETags cannot be used in If-Range
+                partial_downloads.set_if_range(part_path,
+                    (etag if not etag.startswith('W/') else None) or resp.headers.get('last-modified'))
+
+            verifier = download_engine.DownloadVerifier(resolved.get_expected_digests())
+            if offset:
+                verifier.update_from_file(part_path, offset)
+
+            length = int(resp.headers.get('content-length', 0))
+            total_size = (offset + length) if length else (resolved.size or 0)
+
+            if encoded:
+                # unknown, the download is not checked against it
+                total_size = 0
+
+            # undo any Content-Encoding, as iter_content would
+            resp.raw.decode_content = True
+
+            partial_downloads.check_free_space(self.download_folder, total_size - offset)
+
+            with partial_downloads.open_part(part_path, offset, total_size) as f:
+                download_engine.copy_stream(
+                    resp.raw.readinto, f, offset, total_size,
+                    download_engine.ProgressThrottle(status_update_cb),
+                    verifier
+                )
+
+        received = partial_downloads.get_offset(part_path)
+        if received < total_size:
+            raise partial_downloads.IncompleteDownloadError(f'Received {received} of {total_size} bytes')
+
+        verifier.verify()
+        return etag, verifier.get_digests()
+
     def cancel_download(self):
+        self.cancelled.set()
+
+        if self.current_delta:
+            self.current_delta.cancel()
+
         if self.current_download:
             self.current_download.close()
             self.current_download = None
 
     def cleanup(self):
-        if os.path.exists(self.download_folder):
-            shutil.rmtree(self.download_folder)
+        # partial downloads are kept in the same folder, to be resumed
+        for path in self.staged_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.staged_files = []
+
+    def get_source_host(self):
+        url = self.get_embedded_url() or self.get_config().get('url', '')
+        return urlparse(url).netloc or None
 
     def get_embedded_url(self):
         if not self.embedded:
@@ -138,35 +274,58 @@ class StaticFileUpdater(UpdateManager):
         l = len(self.handles_embedded)
         return self.embedded[l:]
 
-    def is_update_available(self):
+    def resolve(self):
         e_url = self.get_embedded_url()
         dwnl_url = self.get_config().get('url')
+        self.resolved = None
+
+        if e_url:
+            zsync_header = self.fetch_zsync_header(e_url)
+            length = zsync_header.get('Length', '')
+
+            self.resolved = ResolvedUpdate(
+                zsync.get_target_url(zsync_header, e_url),
+                size=int(length) if length.isdigit() else None,
+                zsync_url=e_url,
+                zsync_header=zsync_header,
+            )
+        elif dwnl_url:
+            headers = StaticFileUpdater.get_url_headers(dwnl_url)
+            length = headers.get('content-length', '0')
+
+            self.resolved = ResolvedUpdate(
+                dwnl_url,
+                size=int(length) or None,
+                etag=headers.get('etag', None),
+            )
+
+        return self.resolved
 
+    def is_update_available(self):
         if not self.el.file_path:
             return False
 
-        if e_url:
-            zsync_file = requests.get(e_url).text
-            zsync_file_header = zsync_file.split('\n\n', 1)[0]
-            sha_pattern = r"SHA-1:\s*([0-9a-f]{40})"
-            curr_version_hash = get_file_hash(Gio.File.new_for_path(self.el.file_path), alg='sha1')
-
-            match = re.search(sha_pattern, zsync_file_header)
-            if match:
-                updatable = match.group(1) != curr_version_hash
+        resolved = self.resolve()
+
+        if not resolved:
+            return False
+
+        if resolved.zsync_header is not None:
+            sha1 = zsync.get_sha1(resolved.zsync_header)
+
+            if sha1:
+                curr_version_hash = get_file_hash(Gio.File.new_for_path(self.el.file_path), alg='sha1')
+                updatable = sha1 != curr_version_hash
                 logging.info('SHA-1 detected, app updatable: ' + str(updatable))
                 return updatable
 
-        headers = StaticFileUpdater.get_url_headers(dwnl_url)
-        resp_cl = int(headers.get('content-length', '0'))
         old_size = os.path.getsize(self.el.file_path)
+        logging.debug(f'StaticFileUpdater: new url has length {resolved.size}, old was {old_size}')
 
-        logging.debug(f'StaticFileUpdater: new url has length {resp_cl}, old was {old_size}')
-
-        if resp_cl == 0:
+        if not resolved.size:
             return False
 
-        is_size_different = resp_cl != old_size
+        is_size_different = resolved.size != old_size
         return is_size_different
 
     def load_form_rows(self):
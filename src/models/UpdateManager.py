@@ -2,12 +2,16 @@ import os
 import platform
 import re
 import logging
-from typing import Optional, Callable, Literal
+from typing import Optional, Callable, Literal, Hashable
 from abc import ABC, abstractmethod
 
-from ..lib.constants import TMP_DIR
 from ..lib.ini_config import Config
-from ..providers.AppImageProvider import AppImageListElement
+from ..lib import zsync
+from ..lib.http_cache import http_cache
+from ..lib.single_flight import SingleFlight
+from .Models import ResolvedUpdate
+from .Settings import Settings
+from ..providers.AppImageProvider import AppImageProvider, AppImageListElement
 
 
 class UpdateManager(ABC):
@@ -15,18 +19,41 @@ class UpdateManager(ABC):
     label = ''
     handles_embedded: Optional[str] = None
     el: AppImageListElement = None
+    # shared by the managers checked in the same run, see UpdatesChecker
+    request_group: Optional[SingleFlight] = None
     system_arch = platform.machine()
     is_x86 = re.compile(r'(\-|\_|\.)x86(\-|\_|\.)')
     is_arm = re.compile(r'(\-|\_|\.)(arm64|aarch64|armv7l)(\-|\_|\.)')
 
     def __init__(self, el, embedded: Optional[str]=None) -> None:
         self.el = el
-        self.download_folder = os.path.join(TMP_DIR, 'downloads')
         self.embedded = embedded
+        self.resolved: Optional[ResolvedUpdate] = None
+
+    @property
+    def download_folder(self) -> str:
+        return AppImageProvider.get_staging_folder()
 
     def cleanup(self):
         pass
 
+    def resolve(self) -> Optional[ResolvedUpdate]:
+        """
+            Finds the latest release file and stores it in self.resolved
+        """
+        return None
+
+    def get_resolved_update(self) -> Optional[ResolvedUpdate]:
+        """
+            The release file found by the last update check,
+            if it is recent enough to be downloaded without querying the source again
+        """
+        if self.resolved and self.resolved.is_fresh(Settings.settings.get_int('resolved-update-ttl')):
+            return self.resolved
+
+        self.resolved = None
+        return None
+
     @abstractmethod
     def is_update_available(self) -> 'bool | None':
         pass
@@ -49,6 +76,34 @@ class UpdateManager(ABC):
 
     def get_config(self):
         return Config.get_app_update_config(self.el)
+
+    def fetch_once(self, key: Hashable, func: Callable, *args):
+        """
+            Calls func, or waits for the result of a call with the same key
+            made by another manager of the same check run
+        """
+        if self.request_group:
+            return self.request_group.do(key, func, *args)
+
+        return func(*args)
+
+    def fetch_json(self, key: Hashable, url: str):
+        def fetch():
+            resp = http_cache.get(url)
+            resp.raise_for_status()
+            return resp.json()
+
+        return self.fetch_once(key, fetch)
+
+    def fetch_zsync_header(self, url: str) -> dict[str, str]:
+        return self.fetch_once(('zsync-header', url), zsync.fetch_header, url)
+
+    def get_source_host(self) -> Optional[str]:
+        """
+            The server contacted to check for updates;
+            concurrent checks against the same host are limited
+        """
+        return None
     
     def validate_config(self, config: dict):
         """Validates the configuration or raises an exception"""
@@ -3,7 +3,7 @@ import re
 from typing import Optional, Callable
 
 from ..lib.constants import TMP_DIR
-from ..lib import terminal
+from ..lib.appimage_inspector import inspect_appimage
 from ..lib.ini_config import Config
 from ..providers.AppImageProvider import AppImageListElement
 
@@ -60,21 +60,20 @@ class UpdateManagerChecker():
 
     @staticmethod
     def check_app_embedded_url(el: AppImageListElement) -> Optional[str]:
-        readelf_out = terminal.sandbox_sh(['readelf', '--string-dump=.upd_info', '--wide', el.file_path])
-        readelf_out = readelf_out.replace('\n', ' ') + ' '
+        upd_info = ' ' + inspect_appimage(el.file_path).upd_info + ' '
 
         # Github url
-        # example value: " String dump of section '.upd_info':   [     0]  gh-releases-zsync|neovim|neovim|latest|nvim-linux-x86_64.appimage.zsync "
+        # example value: " gh-releases-zsync|neovim|neovim|latest|nvim-linux-x86_64.appimage.zsync "
         pattern_gh = r"gh-releases-zsync\|.*(.zsync)"
-        matches = re.search(pattern_gh, readelf_out)
+        matches = re.search(pattern_gh, upd_info)
 
         if matches:
             return matches[0].strip()
 
         # Static url
-        # example value: " String dump of section '.upd_info':   [     0]  zsync|https://gitlab.com/api/v4/projects/24386000/packages/generic/librewolf/latest/LibreWolf.x86_64.AppImage.zsync "
+        # example value: " zsync|https://gitlab.com/api/v4/projects/24386000/packages/generic/librewolf/latest/LibreWolf.x86_64.AppImage.zsync "
         pattern_link = r"\szsync\|http(.*)\s"
-        matches = re.search(pattern_link, readelf_out)
+        matches = re.search(pattern_link, upd_info)
 
         if matches:
             return matches[0].strip()
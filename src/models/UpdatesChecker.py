@@ -0,0 +1,185 @@
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Callable, Iterator
+
+from ..lib.json_cache import JsonCache
+from ..lib.single_flight import SingleFlight
+from ..providers.AppImageProvider import AppImageListElement
+from .Models import UpdateCheckResult, RateLimitedException
+from .UpdateManager import UpdateManager
+from .UpdateManagerChecker import UpdateManagerChecker
+
+# seconds a single check may run before it is reported as timed out
+CHECK_TIMEOUT = 60
+
+
+class UpdatesChecker():
+    """
+        Checks many apps for updates on a bounded pool of threads.
+        At most max_per_host checks run against the same server at once,
+        and apps sharing a release source make a single request for it;
+        results are delivered as soon as each check completes.
+
+        Checks refused by a rate limited source are reported as deferred
+        and go first in the next run, so that every app is eventually checked.
+    """
+
+    deferred_checks = JsonCache('deferred_update_checks')
+
+    def __init__(self, max_workers=8, max_per_host=2, timeout=CHECK_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+
+    def _get_managers(self, apps: list[AppImageListElement]) -> dict[Optional[str], deque]:
+        queues: dict[Optional[str], deque] = {}
+        request_group = SingleFlight()
+
+        # sorted() is stable, apps keep their order otherwise
+        deferred = self.deferred_checks.keys()
+        apps = sorted(apps, key=lambda el: el.file_path not in deferred)
+
+        for el in apps:
+            try:
+                manager = UpdateManagerChecker.check_url_for_app(el)
+            except Exception as e:
+                logging.error(e)
+                continue
+
+            if not manager:
+                continue
+
+            manager.request_group = request_group
+
+            try:
+                host = manager.get_source_host()
+            except Exception as e:
+                logging.debug(e)
+                host = None
+
+            queues.setdefault(host, deque()).append(manager)
+
+        return queues
+
+    def _check(self, manager: UpdateManager, started: list) -> 'bool | None':
+        started.append(time.monotonic())
+        logging.debug(f'Checking {manager.el.file_path} with: {manager.name}')
+        return manager.is_update_available()
+
+    def iter_results(self, apps: list[AppImageListElement]) -> Iterator[UpdateCheckResult]:
+        """
+            Yields a result for every app that has an update manager,
+            in the order the checks complete
+        """
+        queues = self._get_managers(apps)
+        running: dict[Future, tuple[UpdateManager, Optional[str], list]] = {}
+        running_per_host: dict[Optional[str], int] = {}
+        # checks that timed out keep their thread and their host slot until they return
+        abandoned: dict[Future, Optional[str]] = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='updates-checker')
+
+        def schedule():
+            # round robin across hosts, so that a long queue for one server
+            # does not hold back the others
+            submitted = True
+            while submitted and (len(running) + len(abandoned)) < self.max_workers:
+                submitted = False
+
+                for host in list(queues.keys()):
+                    if (len(running) + len(abandoned)) >= self.max_workers:
+                        break
+
+                    if running_per_host.get(host, 0) >= self.max_per_host:
+                        continue
+
+                    manager = queues[host].popleft()
+                    if not queues[host]:
+                        del queues[host]
+
+                    started = []
+                    future = executor.submit(self._check, manager, started)
+                    running[future] = (manager, host, started)
+                    running_per_host[host] = running_per_host.get(host, 0) + 1
+                    submitted = True
+
+        def release(future: Future):
+            manager, host, started = running.pop(future)
+            running_per_host[host] -= 1
+            return manager
+
+        try:
+            while queues or running:
+                schedule()
+
+                if not running:
+                    # every thread that could run the queued checks is held by a check that timed out
+                    done, _ = wait(abandoned.keys(), timeout=self.timeout, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        running_per_host[abandoned.pop(future)] -= 1
+
+                    if not done:
+                        for queue in queues.values():
+                            for manager in queue:
+                                logging.error(f'Update check for {manager.el.file_path} timed out')
+                                yield UpdateCheckResult(manager.el, manager, timed_out=True)
+
+                        queues.clear()
+
+                    continue
+
+                now = time.monotonic()
+                deadlines = [s[0] + self.timeout for m, h, s in running.values() if s]
+                wait_timeout = max(0, min(deadlines) - now) if deadlines else self.timeout
+
+                done, _ = wait([*running.keys(), *abandoned.keys()], timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future in abandoned:
+                        running_per_host[abandoned.pop(future)] -= 1
+                        continue
+
+                    manager = release(future)
+
+                    try:
+                        result = UpdateCheckResult(manager.el, manager, available=future.result())
+                        self.deferred_checks.pop(manager.el.file_path)
+                    except RateLimitedException as e:
+                        result = UpdateCheckResult(manager.el, manager, deferred_until=e.reset_time)
+                        self.deferred_checks.set(manager.el.file_path, e.reset_time)
+                    except Exception as e:
+                        logging.error(e)
+                        result = UpdateCheckResult(manager.el, manager, error=e)
+
+                    yield result
+
+                now = time.monotonic()
+                for future, (manager, host, started) in list(running.items()):
+                    if started and (now - started[0]) > self.timeout:
+                        # the thread cannot be interrupted, its result will be ignored
+                        running.pop(future)
+                        abandoned[future] = host
+                        logging.error(f'Update check for {manager.el.file_path} timed out')
+                        yield UpdateCheckResult(manager.el, manager, timed_out=True)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.deferred_checks.save()
+
+    def check(self, apps: list[AppImageListElement],
+              callback: Optional[Callable[[UpdateCheckResult], None]]=None) -> list[UpdateCheckResult]:
+        """
+            Blocks until every app has been checked; callback is called
+            from the calling thread for each result as it completes
+        """
+        results = []
+
+        for result in self.iter_results(apps):
+            results.append(result)
+
+            if callback:
+                callback(result)
+
+        return results
@@ -170,8 +170,7 @@ class Preferences(Adw.PreferencesWindow):
         key = 'fetch-updates-in-background'
         value: bool = self.settings.get_boolean(key)
 
-        Config.parser[Config.parser.default_section][key] = Config.return_boolean(value)
-        Config.write()
+        Config.set_default(key, Config.return_boolean(value))
         
         inter = portal("org.freedesktop.portal.Background")
         inter.RequestBackground('', {
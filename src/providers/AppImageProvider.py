@@ -5,6 +5,7 @@ import os
 import shutil
 import filecmp
 import shlex
+import threading
 from xdg import DesktopEntry
 from desktop_entry_lib import DesktopEntry as JdDesktopEntry
 
@@ -12,13 +13,20 @@ import dataclasses
 from ..models.Settings import Settings
 from ..models.AppListElement import AppListElement, InstalledStatus
 from ..lib.constants import TMP_DIR
+from ..lib.json_cache import JsonCache
+from ..lib.metadata_cache import MetadataCache
+from ..lib.icon_loader import IconLoader
+from ..lib.appimage_inspector import inspect_appimage
+from ..lib.squashfs import SquashFsReader, UnsupportedCompressionError
 from ..lib import terminal
+from ..lib import file_transfer
 from ..lib.async_utils import idle
 from ..lib.ini_config import Config
-from ..lib.utils import get_giofile_content_type, gio_copy, get_file_hash, \
+from ..lib.utils import get_giofile_content_type, gio_copy, get_file_hash, get_file_identity, \
     remove_special_chars, get_random_string, get_osinfo, extract_terminal_arguments, show_message_dialog, gnu_naturalsize
 from ..models.Models import AppUpdateElement, InternalError, DownloadInterruptedException
-from typing import Optional, List, TypedDict
+from typing import Callable, Optional, List, TypedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from gi.repository import GLib, Gtk, Gdk, Gio
 from enum import Enum
 
@@ -31,6 +39,37 @@ class ExtractedAppImage():
     icon_file: Optional[Gio.File]
     md5: str
 
+class PreparedInstall():
+    """
+        An AppImage moved to the AppImages folder, waiting for
+        its .desktop file and configuration to be written
+    """
+    extracted_appimage: ExtractedAppImage
+    version: Optional[str] = None
+    dest_appimage_file: Gio.File
+    prefixed_filename: str
+    tmp_path: Optional[str] = None
+    moved_from: Optional[str] = None
+    reserved_filename: Optional[str] = None
+    pinned_md5: Optional[str] = None
+
+# relative to the root of the AppImage filesystem, in order of preference
+HICOLOR_ICON_PATHS = [
+    'usr/share/icons/hicolor/scalable/apps/{icon}.svg',
+    'usr/share/icons/hicolor/512x512/apps/{icon}.png',
+    'usr/share/icons/hicolor/256x256/apps/{icon}.png',
+    'usr/share/icons/hicolor/128x128/apps/{icon}.png',
+    'usr/share/icons/hicolor/96x96/apps/{icon}.png',
+]
+
+METADATA_FILE_MAX_SIZE = 16 * 1024 * 1024
+
+# in the AppImages folder
+STAGING_FOLDER_NAME = '.downloads'
+
+# AppImages loaded and copied at the same time by install_files
+INSTALL_JOBS = min(4, os.cpu_count() or 1)
+
 class AppImageUpdateLogic(Enum):
     REPLACE = 'REPLACE'
     KEEP = 'KEEP'
@@ -91,6 +130,16 @@ class AppImageProvider():
         self.extraction_folder = os.path.join(TMP_DIR, 'appimages')
         self.user_desktop_files_path = os.path.join(GLib.get_home_dir(), '.local', 'share', 'applications')
         self.user_local_share_path = os.path.join(GLib.get_home_dir(), '.local', 'share')
+
+        # Maps each .desktop file to the data needed to build its AppImageListElement
+        self.installed_index = JsonCache('installed_apps_index')
+        self.metadata_cache = MetadataCache()
+        self.missing_icons = JsonCache('missing_icons')
+        self.icon_loader = IconLoader(disk_cache_size=(Settings.settings.get_int('thumbnails-cache-size') * 1024 * 1024))
+
+        # file names chosen by installs that have not moved their file yet
+        self.install_lock = threading.Lock()
+        self.reserved_filenames: set[str] = set()
     desk_entry_section_regex = re.compile(r'\[Desktop Entry\][\s\S]*?(?=\n\[)', flags=re.MULTILINE)
 
     def list_installed(self) -> list[AppImageListElement]:
@@ -101,55 +150,120 @@ class AppImageProvider():
         if not os.path.exists(self.user_desktop_files_path):
             return output
 
-        for file_name in os.listdir(self.user_desktop_files_path):
-            gfile = Gio.File.new_for_path(
-                os.path.join(self.user_desktop_files_path, file_name))
+        with self.installed_index.lock:
+            indexed_paths = set(self.installed_index.keys())
 
-            try:
-                if os.path.isfile(gfile.get_path()) and get_giofile_content_type(gfile) == 'application/x-desktop':
-                    entry = DesktopEntry.DesktopEntry(filename=gfile.get_path())
-                    exec_location = entry.getTryExec()
-                    exec_command_data = extract_terminal_arguments(entry.getExec())
-                    exec_arguments = ' '.join(exec_command_data['arguments'])
-
-                    if os.path.isfile(exec_location):
-                        exec_gfile = Gio.File.new_for_path(exec_location)
-                        exec_in_defalut_folder = os.path.isfile(
-                                os.path.join(default_folder_path, exec_gfile.get_basename()))
-                        exec_in_folder = True if manage_from_outside else exec_in_defalut_folder
-                        app_version = self._get_app_version(None, desktop_entry=entry, return_hash=False)
-                        file_size = os.stat(exec_location).st_size
-
-                        if exec_in_folder and self.can_install_file(exec_gfile):
-                            list_element = AppImageListElement(
-                                name=entry.getName(),
-                                desktop_file_path=gfile.get_path(),
-                                description=entry.getComment(),
-                                version=(app_version or None),
-                                installed_status=InstalledStatus.INSTALLED,
-                                file_path=exec_location,
-                                provider=self.name,
-                                desktop_entry=entry,
-                                trusted=True,
-                                external_folder=(not exec_in_defalut_folder),
-                                exec_arguments=exec_arguments,
-                                env_variables=exec_command_data['env_vars'],
-                                size=file_size,
-                            )
-
-                            list_element.architecture = None
-
-                            output.append(list_element)
-                        else:
-                            logging.debug(f'{gfile.get_path()} skipped because {exec_location} is not a supported file type')
-                    else:
-                        logging.debug(f'{gfile.get_path()} skipped because {exec_location} does not exists on the filesystem')
+            for dir_entry in os.scandir(self.user_desktop_files_path):
+                try:
+                    if not dir_entry.is_file():
+                        continue
 
-            except Exception as e:
-                logging.warn(e)
+                    indexed_paths.discard(dir_entry.path)
+                    indexed = self._get_indexed_desktop_file(dir_entry.path, dir_entry.stat())
+                    app_data = indexed['app']
+
+                    if not app_data:
+                        continue
+
+                    exec_location = app_data['file_path']
+                    exec_info = self._get_indexed_exec_file(dir_entry.path, indexed)
+
+                    if not exec_info:
+                        logging.debug(f'{dir_entry.path} skipped because {exec_location} does not exists on the filesystem')
+                        continue
+
+                    exec_in_defalut_folder = os.path.isfile(
+                            os.path.join(default_folder_path, os.path.basename(exec_location)))
+                    exec_in_folder = True if manage_from_outside else exec_in_defalut_folder
+
+                    if not (exec_in_folder and exec_info['is_appimage']):
+                        logging.debug(f'{dir_entry.path} skipped because {exec_location} is not a supported file type')
+                        continue
+
+                    list_element = AppImageListElement(
+                        name=app_data['name'],
+                        desktop_file_path=dir_entry.path,
+                        description=app_data['description'],
+                        version=(app_data['version'] or None),
+                        installed_status=InstalledStatus.INSTALLED,
+                        file_path=exec_location,
+                        provider=self.name,
+                        desktop_entry=DesktopEntry.DesktopEntry(filename=dir_entry.path),
+                        trusted=True,
+                        external_folder=(not exec_in_defalut_folder),
+                        exec_arguments=app_data['exec_arguments'],
+                        env_variables=list(app_data['env_variables']),
+                        size=exec_info['size'],
+                    )
+
+                    list_element.architecture = None
+
+                    output.append(list_element)
+
+                except Exception as e:
+                    logging.warn(e)
+
+            for p in indexed_paths:
+                self.installed_index.pop(p)
+
+            self.installed_index.save()
 
         return output
 
+    def _get_indexed_desktop_file(self, file_path: str, stat_result: os.stat_result) -> dict:
+        """Returns the index record of a .desktop file, parsing it only if it changed since the last time"""
+        stat_key = [stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino]
+        indexed = self.installed_index.get(file_path)
+
+        if indexed and indexed['stat'] == stat_key:
+            return indexed
+
+        indexed = {'stat': stat_key, 'app': None, 'exec': None}
+
+        try:
+            gfile = Gio.File.new_for_path(file_path)
+
+            if get_giofile_content_type(gfile) == 'application/x-desktop':
+                entry = DesktopEntry.DesktopEntry(filename=file_path)
+                exec_command_data = extract_terminal_arguments(entry.getExec())
+
+                indexed['app'] = {
+                    'name': entry.getName(),
+                    'description': entry.getComment(),
+                    'version': self._get_app_version(None, desktop_entry=entry, return_hash=False),
+                    'file_path': entry.getTryExec(),
+                    'exec_arguments': ' '.join(exec_command_data['arguments']),
+                    'env_variables': exec_command_data['env_vars'],
+                }
+        except Exception as e:
+            logging.warn(e)
+
+        self.installed_index.set(file_path, indexed)
+        return indexed
+
+    def _get_indexed_exec_file(self, desktop_file_path: str, indexed: dict) -> Optional[dict]:
+        """Returns size and type of the executable referenced by a .desktop file, sniffing it only if it changed"""
+        exec_location = indexed['app']['file_path']
+
+        if not exec_location or not os.path.isfile(exec_location):
+            return None
+
+        exec_identity = get_file_identity(exec_location)
+        exec_info = indexed['exec']
+
+        if exec_info and exec_info['identity'] == exec_identity:
+            return exec_info
+
+        exec_info = {
+            'identity': exec_identity,
+            'size': exec_identity[2],
+            'is_appimage': self.can_install_file(Gio.File.new_for_path(exec_location)),
+        }
+
+        indexed['exec'] = exec_info
+        self.installed_index.set(desktop_file_path, indexed)
+        return exec_info
+
     def is_installed(self, el: AppImageListElement) -> bool:
         if el.file_path and os.path.exists(self._get_appimages_default_destination_path()):
             for file_name in os.listdir(self._get_appimages_default_destination_path()):
@@ -177,13 +291,106 @@ class AppImageProvider():
             if el.desktop_entry and icon_theme.has_icon(el.desktop_entry.getIcon()):
                 return Gtk.Image.new_from_icon_name(el.desktop_entry.getIcon())
 
-            extracted = self._load_appimage_metadata(el)
+            if not self._is_icon_missing(el):
+                extracted = self._load_appimage_metadata(el)
 
-            if extracted.icon_file and os.path.exists(extracted.icon_file.get_path()):
-                return Gtk.Image.new_from_file(extracted.icon_file.get_path())
+                if extracted.icon_file and os.path.exists(extracted.icon_file.get_path()):
+                    return Gtk.Image.new_from_file(extracted.icon_file.get_path())
+
+                self._set_icon_missing(el)
 
         return Gtk.Image(icon_name='gl-application-x-executable-symbolic')
 
+    def get_icon_async(self, el: AppImageListElement, size: int, callback: Callable[[Gtk.Image], None]):
+        """
+            Like get_icon, but icons are decoded at the given size and AppImages are extracted
+            in the icon loader threads; callback is always invoked on the main thread
+        """
+        icon_path = None
+
+        if el.desktop_entry:
+            icon_path = el.desktop_entry.getIcon()
+
+        if icon_path and os.path.isfile(icon_path):
+            texture = self.icon_loader.get_cached(icon_path, size)
+
+            if texture:
+                callback(Gtk.Image.new_from_paintable(texture))
+                return
+
+            future = self.icon_loader.submit(self.icon_loader.load, icon_path, size)
+        else:
+            icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
+
+            if el.desktop_entry and icon_theme.has_icon(el.desktop_entry.getIcon()):
+                callback(Gtk.Image.new_from_icon_name(el.desktop_entry.getIcon()))
+                return
+
+            if self._is_icon_missing(el):
+                callback(Gtk.Image(icon_name='gl-application-x-executable-symbolic'))
+                return
+
+            future = self.icon_loader.submit(self._load_extracted_icon, el, size)
+
+        future.add_done_callback(lambda f: GLib.idle_add(self._on_icon_loaded, f, callback))
+
+    def _on_icon_loaded(self, future: Future, callback: Callable[[Gtk.Image], None]):
+        texture = None
+
+        try:
+            texture = future.result()
+        except Exception as e:
+            logging.error(f'Cannot load icon: {e}')
+
+        if texture:
+            callback(Gtk.Image.new_from_paintable(texture))
+        else:
+            callback(Gtk.Image(icon_name='gl-application-x-executable-symbolic'))
+
+        return GLib.SOURCE_REMOVE
+
+    def _load_extracted_icon(self, el: AppImageListElement, size: int) -> Optional[Gdk.Texture]:
+        try:
+            # list elements are only modified on the main thread
+            extracted = el.extracted or self._read_appimage_metadata(el)
+            GLib.idle_add(self._set_extracted, el, extracted)
+
+            if extracted.icon_file and os.path.exists(extracted.icon_file.get_path()):
+                texture = self.icon_loader.load(extracted.icon_file.get_path(), size)
+
+                if texture:
+                    return texture
+        except Exception as e:
+            logging.error(f'Cannot extract the icon of {el.file_path}: {e}')
+
+        self._set_icon_missing(el)
+        return None
+
+    def _set_extracted(self, el: AppImageListElement, extracted: ExtractedAppImage):
+        if not el.extracted:
+            el.desktop_entry = extracted.desktop_entry
+            el.extracted = extracted
+
+        return GLib.SOURCE_REMOVE
+
+    def _is_icon_missing(self, el: AppImageListElement) -> bool:
+        try:
+            return self.missing_icons.get(el.file_path) == get_file_identity(el.file_path)
+        except OSError:
+            return False
+
+    def _set_icon_missing(self, el: AppImageListElement):
+        """
+            Remembers that the icon of an AppImage could not be resolved,
+            until the file is modified
+        """
+        try:
+            with self.missing_icons.lock:
+                self.missing_icons.set(el.file_path, get_file_identity(el.file_path))
+                self.missing_icons.save()
+        except OSError as e:
+            logging.warning(str(e))
+
     def get_description(self, el: AppImageListElement) -> str:
         if el.desktop_entry:
             return el.desktop_entry.getComment()
@@ -202,12 +409,16 @@ class AppImageProvider():
     def refresh_arch(self, el: AppImageListElement):
         el.architecture = self.get_elf_arch(el)
 
+    @Config.transaction()
     def uninstall(self, el: AppImageListElement, force_delete=False, remove_configuration=True):
         logging.info(f'Removing {el.file_path}')
 
         gf = Gio.File.new_for_path(el.file_path)
 
-        if force_delete:
+        if not os.path.exists(el.file_path):
+            # moved away by reload_metadata
+            pass
+        elif force_delete:
             os.remove(el.file_path)
         else:
             try:
@@ -236,17 +447,14 @@ class AppImageProvider():
     def run(self, el: AppImageListElement):
         if el.trusted:
             if el.installed_status is InstalledStatus.INSTALLED:
-                gtk_launch = False
+                gtk_launch = terminal.host_has_command('gtk-launch')
 
-                try:
-                    terminal.host_sh(['which', 'gtk-launch'])
-                    gtk_launch = True
-                except Exception as e:
+                if not gtk_launch:
                     logging.warning('gtk-launch is missing, falling back to executable launch')
 
                 if gtk_launch and el.desktop_file_path:
                     desktop_file_name = os.path.basename(el.desktop_file_path)
-                    terminal.host_threaded_sh(['gtk-launch', desktop_file_name], callback=self._check_launch_output, return_stderr=True)
+                    terminal.host_threaded_sh(['gtk-launch', desktop_file_name], callback=self._check_launch_output, return_stderr=True, long_running=True)
                 else:
                     self._run_from_desktopentry(el)
             else:
@@ -262,14 +470,38 @@ class AppImageProvider():
 
         return False
 
+    @Config.transaction()
     def install_file(self, el: AppImageListElement):
+        prepared = self.prepare_install(el)
+        self.commit_install(el, prepared)
+        self.update_desktop_database()
+
+    def prepare_install(self, el: AppImageListElement) -> PreparedInstall:
+        """
+            First phase of install_file: loads the metadata of the AppImage
+            and moves or copies it to the AppImages folder.
+            Can run for many apps at the same time.
+        """
         logging.info('Installing appimage: ' + el.file_path)
         el.installed_status = InstalledStatus.INSTALLING
         extracted_appimage: Optional[ExtractedAppImage] = None
         appimages_destination_path = self._get_appimages_default_destination_path()
+        prepared = PreparedInstall()
 
         try:
             extracted_appimage = self._load_appimage_metadata(el)
+
+            # the extracted files are read when the install is committed,
+            # other installs must not evict them from the cache until then
+            while extracted_appimage.desktop_file:
+                if self.metadata_cache.pin(extracted_appimage.md5):
+                    prepared.pinned_md5 = extracted_appimage.md5
+                    break
+
+                # evicted by another install since it was loaded
+                el.extracted = None
+                extracted_appimage = self._load_appimage_metadata(el)
+
             version = self._get_app_version(extracted_appimage, return_hash=False)
             dest_file_info = extracted_appimage.appimage_file.query_info('*', Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS)
 
@@ -310,34 +542,84 @@ class AppImageProvider():
                 appimage_filename = remove_special_chars(appimage_filename).lower()
 
                 i = 0
-                files_in_dest_dir = os.listdir(self._get_appimages_default_destination_path())
 
-                # if there is already an app with the same name,
-                # we try not to overwrite
-                while appimage_filename in files_in_dest_dir:
-                    if i == 0 and version:
-                        appimage_filename = app_name_without_ext + '_' + version.replace('.', '_')
-                    else:
-                        appimage_filename = app_name_without_ext + f'_{i}'
+                with self.install_lock:
+                    # names taken by apps being installed in parallel, which are not in the folder yet
+                    files_in_dest_dir = [*os.listdir(self._get_appimages_default_destination_path()), *self.reserved_filenames]
+
+                    # if there is already an app with the same name,
+                    # we try not to overwrite
+                    while appimage_filename in files_in_dest_dir:
+                        if i == 0 and version:
+                            appimage_filename = app_name_without_ext + '_' + version.replace('.', '_')
+                        else:
+                            appimage_filename = app_name_without_ext + f'_{i}'
+
+                        if append_file_ext:
+                            appimage_filename = appimage_filename + '.appimage'
 
-                    if append_file_ext:
-                        appimage_filename = appimage_filename + '.appimage'
+                        i += 1
 
-                    i += 1
+                    self.reserved_filenames.add(appimage_filename)
+                    prepared.reserved_filename = appimage_filename
 
                 prefixed_filename = os.path.splitext(appimage_filename)[0]
 
             dest_appimage_file = Gio.File.new_for_path(
                 os.path.join(appimages_destination_path, appimage_filename))
 
-            if not gio_copy(extracted_appimage.appimage_file, dest_appimage_file):
+            source_path = extracted_appimage.appimage_file.get_path()
+            source_folder = os.path.dirname(source_path)
+
+            # downloads are staged on the same filesystem, so that moving them is a rename
+            move_source = (source_folder == self.get_staging_folder()) or \
+                (Settings.settings.get_boolean('move-appimage-on-integration') and source_folder != appimages_destination_path)
+
+            # the file replaces the destination only when the install is committed,
+            # so that a failed update leaves the installed version in place
+            tmp_path = os.path.join(appimages_destination_path, f'.{appimage_filename}.{get_random_string()}.tmp')
+
+            try:
+                if move_source:
+                    file_transfer.move_file(source_path, tmp_path)
+                    prepared.moved_from = source_path
+                else:
+                    file_transfer.copy_file(source_path, tmp_path)
+
+                prepared.tmp_path = tmp_path
+                os.chmod(tmp_path, 0o755)
+            except OSError as e:
+                logging.error(e)
                 raise InternalError('Error while moving appimage file to the destination folder')
 
-            logging.debug(f'file copied to {appimages_destination_path}')
+            logging.debug(f'file {"moved" if move_source else "copied"} to {appimages_destination_path}')
 
             el.file_path = dest_appimage_file.get_path()
-            el.set_trusted()
 
+            prepared.extracted_appimage = extracted_appimage
+            prepared.version = version
+            prepared.dest_appimage_file = dest_appimage_file
+            prepared.prefixed_filename = prefixed_filename
+        except Exception as e:
+            logging.error('Appimage installation error: ' + str(e))
+            self._discard_prepared_install(el, prepared)
+            raise e
+
+        return prepared
+
+    def commit_install(self, el: AppImageListElement, prepared: PreparedInstall):
+        """
+            Second phase of install_file: writes the icon, the .desktop file and the configuration,
+            then puts the AppImage in place, replacing the previous version if any.
+            Installs must be committed one at a time; the desktop database is not updated.
+        """
+        extracted_appimage = prepared.extracted_appimage
+        version = prepared.version
+        dest_appimage_file = prepared.dest_appimage_file
+        prefixed_filename = prepared.prefixed_filename
+        appimages_destination_path = self._get_appimages_default_destination_path()
+
+        try:
             # copy the icon file
             icon_file = None
             dest_appimage_icon_file = None
@@ -439,57 +721,119 @@ class AppImageProvider():
             app_config['default_exec_arguments'] = new_default_exec_arguments
             Config.set_app_config(el, app_config)
 
+            os.replace(prepared.tmp_path, dest_appimage_file.get_path())
+            prepared.tmp_path = None
+
+            if prepared.moved_from:
+                extracted_appimage.appimage_file = dest_appimage_file
+
+            el.set_trusted()
         except Exception as e:
             logging.error('Appimage installation error: ' + str(e))
+            self._discard_prepared_install(el, prepared)
             raise e
+        finally:
+            self._release_prepared_install(prepared)
+
+        el.updating_from = None
+
+    @Config.transaction()
+    def install_files(self, els: list[AppImageListElement], jobs=INSTALL_JOBS,
+                      callback: Optional[Callable[[AppImageListElement, Optional[Exception]], None]]=None) -> list[tuple[AppImageListElement, Optional[Exception]]]:
+        """
+            Installs many AppImages: they are prepared on a pool of threads and committed
+            one by one, in the calling thread, as soon as each is ready.
+            The configuration is written and the desktop database is updated once, at the end.
+            callback is called after each app, with the error that made it fail if any.
+        """
+        results = []
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix='install') as executor:
+            futures = {executor.submit(self.prepare_install, el): el for el in els}
+
+            for future in as_completed(futures):
+                el = futures[future]
+                error = None
+
+                try:
+                    self.commit_install(el, future.result())
+                except Exception as e:
+                    error = e
+                    el.installed_status = InstalledStatus.NOT_INSTALLED
+
+                results.append((el, error))
 
-        if Settings.settings.get_boolean('move-appimage-on-integration'):
-            if os.path.dirname(extracted_appimage.appimage_file.get_path()) != appimages_destination_path:
-                logging.info('Deleting original appimage file from: '  + extracted_appimage.appimage_file.get_path())
-                if not extracted_appimage.appimage_file.delete(None):
-                    raise InternalError('Cannot delete original file')
+                if callback:
+                    callback(el, error)
 
+        if any(error is None for el, error in results):
+            self.update_desktop_database()
+
+        return results
+
+    def update_desktop_database(self):
         update_dkt_db = terminal.host_sh(['update-desktop-database', self.user_desktop_files_path, '-q'], return_stderr=True)
         logging.debug(update_dkt_db)
 
-        el.updating_from = None
+    def _discard_prepared_install(self, el: AppImageListElement, prepared: PreparedInstall):
+        """
+            Removes the temporary copy of a failed install, or gives a moved file back to the user;
+            the file of the installed version, if any, is never touched
+        """
+        self._release_prepared_install(prepared)
+
+        if prepared.tmp_path and os.path.exists(prepared.tmp_path):
+            if prepared.moved_from:
+                file_transfer.move_file(prepared.tmp_path, prepared.moved_from)
+            else:
+                os.remove(prepared.tmp_path)
+
+        prepared.tmp_path = None
 
+        if prepared.moved_from:
+            el.file_path = prepared.moved_from
+
+    def _release_prepared_install(self, prepared: PreparedInstall):
+        with self.install_lock:
+            self.reserved_filenames.discard(prepared.reserved_filename)
+
+        if prepared.pinned_md5:
+            self.metadata_cache.unpin(prepared.pinned_md5)
+            prepared.pinned_md5 = None
+
+    @Config.transaction()
     def reload_metadata(self, el: AppImageListElement):
         if not (el.installed_status is InstalledStatus.INSTALLED):
             return
 
         logging.info(f'Reloading metadata for {el.file_path}')
         random_str = get_random_string()
-        dest_path = f'{self.extraction_folder}/gearlever_{random_str}'
+        staging_folder = self.get_staging_folder()
 
-        if not os.path.exists(dest_path):
-            os.makedirs(dest_path)
+        if not os.path.exists(staging_folder):
+            os.makedirs(staging_folder)
 
-        outdated_file = Gio.File.new_for_path(el.file_path)
-        new_file = Gio.File.new_for_path(f'{dest_path}/tmp.appimage')
-
-        gio_copy(outdated_file, new_file)
+        # install_file moves the file back from the staging folder, without copying it
+        original_file_path = el.file_path
+        staged_file_path = os.path.join(staging_folder, f'{random_str}.appimage')
+        file_transfer.move_file(original_file_path, staged_file_path)
 
         self.uninstall(el, remove_configuration=False)
 
-        el.file_path = f'{dest_path}/tmp.appimage'
+        el.file_path = staged_file_path
         el.extracted = None
 
-        self.install_file(el)
+        try:
+            self.install_file(el)
+        except Exception as e:
+            if os.path.exists(staged_file_path):
+                file_transfer.move_file(staged_file_path, original_file_path)
+
+            raise e
 
     def get_appimage_type(self, el: AppImageListElement) -> str:
         # https://github.com/AppImage/AppImageSpec/blob/fb05d9e1b8b8616dbeb7491303edc537dca573f3/draft.md#type-1-image-format
-
-        appimage_type = 0
-        with open(el.file_path, 'rb') as f:
-            magic = f.read(11)[-3:]
-
-            if magic == b'\x41\x49\x01':  # 0x414901
-                appimage_type = 1
-            elif magic == b'\x41\x49\x02':  # 0x414902
-                appimage_type = 2
-
-        return str(appimage_type)
+        return str(inspect_appimage(el.file_path).appimage_type)
 
     def create_list_element_from_file(self, file: Gio.File, return_new_el=False) -> AppImageListElement:
         if not self.can_install_file(file):
@@ -584,21 +928,21 @@ class AppImageProvider():
     def update_from_url(self, manager, el: AppImageListElement, status_cb: callable) -> AppImageListElement | None:
         try:
             update_file_path, f_hash = manager.download(status_cb)
-        except DownloadInterruptedException as de:
-            return None
-        except Exception as e:
-            raise e
+            update_gfile = Gio.file_new_for_path(update_file_path)
 
-        update_gfile = Gio.file_new_for_path(update_file_path)
+            if not self.can_install_file(update_gfile):
+                raise Exception(_('The downloaded file is not a valid appimage, please check if the provided URL is correct'))
 
-        if not self.can_install_file(update_gfile):
-            raise Exception(_('The downloaded file is not a valid appimage, please check if the provided URL is correct'))
+            list_element = self.create_list_element_from_file(update_gfile, return_new_el=True)
 
-        list_element = self.create_list_element_from_file(update_gfile, return_new_el=True)
-
-        list_element.update_logic = AppImageUpdateLogic.REPLACE
-        list_element.updating_from = el
-        self.install_file(list_element)
+            list_element.update_logic = AppImageUpdateLogic.REPLACE
+            list_element.updating_from = el
+            self.install_file(list_element)
+        except DownloadInterruptedException as de:
+            return None
+        finally:
+            # the staging folder is not cleared on exit, a download that was not installed is removed now
+            manager.cleanup()
 
         list_element.updating_from = None
         list_element.update_logic = None
@@ -609,16 +953,7 @@ class AppImageProvider():
         if not el.file_path:
             return False
 
-        running = terminal.host_sh(["ps", "-eo", "exe"])
-        spl = running.split('\n')
-
-        for l in spl:
-            l = l.strip()
-
-            if l == el.file_path:
-                return True
-            
-        return False
+        return el.file_path in terminal.get_running_executables()
 
     # Private methods
     def _run_filepath(self, el: AppImageListElement):
@@ -626,7 +961,7 @@ class AppImageProvider():
 
         if is_nixos:
             self._nixos_checks()
-            terminal.host_threaded_sh(['appimage-run', el.file_path], callback=self._check_launch_output, return_stderr=True)
+            terminal.host_threaded_sh(['appimage-run', el.file_path], callback=self._check_launch_output, return_stderr=True, long_running=True)
             return
 
         exec_args = []
@@ -634,7 +969,7 @@ class AppImageProvider():
             exec_args = shlex.split(el.desktop_entry.getExec())[1:]
             exec_args = [i for i in exec_args if i not in self.desktop_exec_codes]
 
-        terminal.host_threaded_sh([el.file_path, *exec_args], callback=self._check_launch_output, return_stderr=True)
+        terminal.host_threaded_sh([el.file_path, *exec_args], callback=self._check_launch_output, return_stderr=True, long_running=True)
 
     def _run_from_desktopentry(self, el: AppImageListElement):
         is_nixos = re.search(r"^NAME=NixOS$", get_osinfo(), re.MULTILINE) != None
@@ -647,12 +982,10 @@ class AppImageProvider():
         cmd = shlex.split(el.desktop_entry.getExec())
         cmd = [i for i in cmd if i not in self.desktop_exec_codes]
 
-        terminal.host_threaded_sh(cmd, callback=self._check_launch_output, return_stderr=True)
+        terminal.host_threaded_sh(cmd, callback=self._check_launch_output, return_stderr=True, long_running=True)
 
     def _nixos_checks(self):
-        try:
-            terminal.host_sh(['which', 'appimage-run'])
-        except Exception as e:
+        if not terminal.host_has_command('appimage-run'):
             msg = _("Running AppImages on NixOS requires appimage-run")
             raise Exception(msg)
 
@@ -700,12 +1033,34 @@ class AppImageProvider():
         block_unsafe_extractor = Settings.settings.get_boolean('block-unsafe-extractor')
 
 
-        try:
-            terminal.sandbox_sh(['dwarfsck', f'--input={file.get_path()}', '-q', '-detail=0', '--no-check'], error_quiet=True)
+        appimage_info = inspect_appimage(file.get_path())
+
+        if appimage_info.payload_format == 'squashfs':
+            try:
+                metadata_files = self._read_appimage_metadata_files(file.get_path(), appimage_info.payload_offset)
+
+                if any([f.endswith('.desktop') for f in metadata_files.keys()]):
+                    for rel_path, content in metadata_files.items():
+                        dest_file_path = os.path.join(squashfs_root_folder, rel_path)
+                        os.makedirs(os.path.dirname(dest_file_path), exist_ok=True)
+
+                        with open(dest_file_path, 'wb') as f:
+                            f.write(content)
+
+                    logging.info('Metadata loaded with the built-in squashfs reader')
+                    return squashfs_root_folder
+
+                logging.info('No desktop file found by the built-in squashfs reader')
+            except UnsupportedCompressionError as e:
+                logging.info(str(e))
+            except Exception as e:
+                logging.warning(f'Built-in squashfs reader failed: {e}')
+
+        if appimage_info.payload_format == 'dwarfs':
             use_dwarf = True
-        except:
+        else:
             use_7zz = True
-            logging.info('Filesystem is not dwarfsck')
+            logging.info('Filesystem is not dwarfs')
 
         if use_dwarf:
             os.mkdir(squashfs_root_folder)
@@ -742,7 +1097,7 @@ class AppImageProvider():
 
         if  use_unsquashfs:
             logging.debug('Testing with unsquashfs')
-            appimage_offset = terminal.sandbox_sh(['get_appimage_offset', file.get_path()])
+            appimage_offset = str(appimage_info.payload_offset)
 
             try:
                 terminal.sandbox_sh(['unsquashfs', '-o', appimage_offset, '-l', file.get_path()])
@@ -768,25 +1123,100 @@ class AppImageProvider():
 
         return squashfs_root_folder
 
+    def _read_appimage_metadata_files(self, file_path: str, payload_offset: int) -> dict[str, bytes]:
+        """
+            Reads the root desktop file, .DirIcon and the icon candidates straight from the
+            squashfs image; returns their content by path, relative to the root of the image
+        """
+        files = {}
+        desktop_entry_icon = None
+
+        with SquashFsReader(file_path, offset=payload_offset) as squashfs:
+            for name in squashfs.listdir('/'):
+                if name.endswith('.desktop') and squashfs.is_file(name):
+                    files[name] = squashfs.read_file(name, max_size=METADATA_FILE_MAX_SIZE)
+                    icon_match = re.search(r'^Icon\s*=\s*(.+?)\s*$', files[name].decode('utf-8', errors='replace'), re.MULTILINE)
+
+                    if icon_match:
+                        desktop_entry_icon = re.sub(r"\.(png|svg)$", '', icon_match.group(1))
+                        break
+
+            icon_candidates = [['.DirIcon']]
+            if desktop_entry_icon and ('/' not in desktop_entry_icon):
+                icon_candidates.append([f'{desktop_entry_icon}.svg', f'{desktop_entry_icon}.png'])
+                icon_candidates.append([p.format(icon=desktop_entry_icon) for p in HICOLOR_ICON_PATHS])
+
+            # only the first existing file of each group is used by _load_appimage_metadata
+            for group in icon_candidates:
+                for rel_path in group:
+                    if squashfs.is_file(rel_path):
+                        files[rel_path] = squashfs.read_file(rel_path, max_size=METADATA_FILE_MAX_SIZE)
+                        break
+
+        return files
+
     def _load_appimage_metadata(self, el: AppImageListElement) -> ExtractedAppImage:
         if el.extracted:
             return el.extracted
 
+        result = self._read_appimage_metadata(el)
+        el.desktop_entry = result.desktop_entry
+        el.extracted = result
+
+        return result
+
+    def _read_appimage_metadata(self, el: AppImageListElement) -> ExtractedAppImage:
+        """
+            Like _load_appimage_metadata, without storing the result in el
+        """
         file = Gio.File.new_for_path(el.file_path)
 
         icon_file: Optional[Gio.File] = None
         desktop_file: Optional[Gio.File] = None
         desktop_entry: Optional[DesktopEntry.DesktopEntry] = None
 
-        # hash file
-        md5_hash = get_file_hash(file)
-        temp_file_name = 'gearlever_appimage_' + md5_hash
-        tmp_folder = Gio.File.new_for_path(f'{self.extraction_folder}/{temp_file_name}')
+        # results are cached by file identity first, so that unchanged files are not even hashed
+        identity = get_file_identity(el.file_path)
+        md5_hash = self.metadata_cache.find_by_identity(identity)
+
+        if md5_hash:
+            logging.debug(f'Loading cached metadata for {el.file_path}')
+        else:
+            md5_hash = get_file_hash(file)
+
+            # the same AppImage may be loaded by more threads at once
+            with self.metadata_cache.get_lock(md5_hash):
+                if not self.metadata_cache.find_by_hash(md5_hash, identity):
+                    self._extract_appimage_metadata(el, md5_hash, identity)
+
+        tmp_folder = Gio.File.new_for_path(self.metadata_cache.get_folder(md5_hash))
+
+        if tmp_folder.get_child('app.desktop').query_exists():
+            desktop_file = tmp_folder.get_child('app.desktop')
+            desktop_entry = DesktopEntry.DesktopEntry(desktop_file.get_path())
+
+        for f in glob.glob('icon*', root_dir=tmp_folder.get_path()):
+            icon_file = tmp_folder.get_child(f)
+            break
+
+        result = ExtractedAppImage()
+        result.desktop_entry = desktop_entry
+        result.extraction_folder = tmp_folder.get_path()
+        result.appimage_file = file
+        result.desktop_file = desktop_file
+        result.icon_file = icon_file
+        result.md5 = md5_hash
+
+        return result
+
+    def _extract_appimage_metadata(self, el: AppImageListElement, md5_hash: str, identity: list[int]):
+        desktop_file: Optional[Gio.File] = None
+        desktop_entry: Optional[DesktopEntry.DesktopEntry] = None
 
-        if tmp_folder.query_exists():
-            shutil.rmtree(tmp_folder.get_path())
+        # extracted apart from the cached folder, which is replaced only when the extraction succeeds
+        tmp_folder = Gio.File.new_for_path(self.metadata_cache.make_tmp_folder(md5_hash))
 
-        if tmp_folder.make_directory_with_parents(None):
+        try:
             mounted_appimage_path = self._extract_appimage(el)
             extraction_folder = Gio.File.new_for_path(mounted_appimage_path)
 
@@ -815,7 +1245,7 @@ class AppImageProvider():
                     # https://github.com/AppImage/AppImageSpec/blob/master/draft.md#the-filesystem-image
 
                     tmp_icon_file: Optional[Gio.File] = None
-                    
+
                     if not tmp_icon_file:
                         # if icon file is still not found, let's try with .DirIcon file
                         diricon = Gio.File.new_for_path(
@@ -836,7 +1266,7 @@ class AppImageProvider():
                                     if diricon_linked_to.query_exists() and \
                                         get_giofile_content_type(diricon_linked_to) in ['image/png']:
                                         tmp_icon_file = diricon_linked_to
-                    
+
                     if not tmp_icon_file:
                         icon_xt_f = None
                         for icon_xt in ['.svg', '.png']:
@@ -850,13 +1280,8 @@ class AppImageProvider():
                             # always prefer svg(s) to png(s)
                             # if a png is not found in the root of the filesystem, try somewhere else
 
-                            icons_folder_prefix = '/usr/share/icons/hicolor'
                             icon_try_paths = [
-                                extraction_folder.get_path() + f'{icons_folder_prefix}/scalable/apps/{desktop_entry_icon}.svg',
-                                extraction_folder.get_path() + f'{icons_folder_prefix}/512x512/apps/{desktop_entry_icon}.png',
-                                extraction_folder.get_path() + f'{icons_folder_prefix}/256x256/apps/{desktop_entry_icon}.png',
-                                extraction_folder.get_path() + f'{icons_folder_prefix}/128x128/apps/{desktop_entry_icon}.png',
-                                extraction_folder.get_path() + f'{icons_folder_prefix}/96x96/apps/{desktop_entry_icon}.png'
+                                os.path.join(extraction_folder.get_path(), p.format(icon=desktop_entry_icon)) for p in HICOLOR_ICON_PATHS
                             ]
 
                             for icon_xt in icon_try_paths:
@@ -875,23 +1300,28 @@ class AppImageProvider():
             except Exception as e:
                 logging.error(str(e))
 
-        result = ExtractedAppImage()
-        result.desktop_entry = desktop_entry
-        result.extraction_folder = tmp_folder.get_path()
-        result.appimage_file = file
-        result.desktop_file = desktop_file
-        result.icon_file = icon_file
-        result.md5 = md5_hash
-
-        el.desktop_entry = desktop_entry
-        el.extracted = result
+            shutil.rmtree(os.path.dirname(mounted_appimage_path), ignore_errors=True)
 
-        return result
+            # failed extractions are not cached, they will be tried again next time
+            if desktop_entry:
+                cache_size = Settings.settings.get_int('metadata-cache-size') * 1024 * 1024
+                self.metadata_cache.store(md5_hash, identity, max_size=cache_size, extracted_folder=tmp_folder.get_path())
+        finally:
+            shutil.rmtree(tmp_folder.get_path(), ignore_errors=True)
 
-    def _get_appimages_default_destination_path(self) -> str:
+    @staticmethod
+    def _get_appimages_default_destination_path() -> str:
         folder = Settings.settings.get_string('appimages-default-folder')
         return re.sub(r'^~', GLib.get_home_dir(), folder)
 
+    @staticmethod
+    def get_staging_folder() -> str:
+        """
+            A hidden folder next to the installed AppImages where updates are downloaded,
+            so that installing them is a rename within the same filesystem
+        """
+        return os.path.join(AppImageProvider._get_appimages_default_destination_path(), STAGING_FOLDER_NAME)
+
     def _get_app_version(self, extracted_appimage: Optional[ExtractedAppImage], desktop_entry: Optional[DesktopEntry] = None, return_hash=True):
         if not desktop_entry:
             desktop_entry = extracted_appimage.desktop_entry
@@ -904,18 +1334,11 @@ class AppImageProvider():
         return version
 
     def get_elf_arch(self, el: AppImageListElement) -> AppImageArchitecture:
-        file_brief = terminal.sandbox_sh(['file', '--brief', '--exclude-quiet=apptype', '--exclude-quiet=ascii',
-                                                     '--exclude-quiet=compress', '--exclude-quiet=csv', '--exclude-quiet=elf',
-                                                     '--exclude-quiet=encoding', '--exclude-quiet=tar', '--exclude-quiet=cdf',
-                                                     '--exclude-quiet=json', '--exclude-quiet=simh', '--exclude-quiet=text', '--exclude-quiet=tokens',
-                                                     el.file_path])
-
-        aarch = AppImageArchitecture.UNKNOWN
-        file_brief = file_brief.lower()
+        elf_arch = inspect_appimage(el.file_path).architecture
 
-        if 'aarch64' in file_brief or ' arm ' in file_brief:
-            aarch = AppImageArchitecture.ARM_64
-        elif 'x86-64' in file_brief or 'x86_64' in file_brief:
-            aarch = AppImageArchitecture.X86_64
+        if elf_arch == 'aarch64':
+            return AppImageArchitecture.ARM_64
+        elif elf_arch == 'x86_64':
+            return AppImageArchitecture.X86_64
 
-        return aarch
+        return AppImageArchitecture.UNKNOWN
@@ -109,6 +109,17 @@ class TestGearLever(unittest.TestCase):
         self.assertNotIn(appname, self.get_installed_files())
         self.assertNotIn('mudlet', self.get_icon_files())
 
+    def test_install_many(self):
+        appnames = ['mudlet.appimage', 'shutter_encoder.appimage']
+        self.runCommand(['--integrate', *[os.path.join(self.download_dir, a) for a in appnames], '--jobs', '2', '-y'])
+        installed = self.runCommand(['--list-installed', '-v'])
+
+        for appname in appnames:
+            self.assertIn(appname, self.get_installed_files())
+            self.assertIn(appname, installed)
+
+        self.runCommand(['--remove-all', '-y'])
+
     def test_install_shutter_encoder(self):
         appname = 'shutter_encoder.appimage'
         self.runCommand(['--integrate', os.path.join(self.download_dir, appname), '-y'])